@@ -1,14 +1,34 @@
-from flask import Flask, request, jsonify, session, send_from_directory  #web framework for the application
+from flask import Flask, Response, request, jsonify, session, send_file, send_from_directory  #web framework for the application
 from flask_cors import CORS  #allows the frontend to make requests to Flask backend
-from database import get_db_connection, hash_password, init_db
+from database import db_connection, hash_password, init_db
+from database import (
+    CLEAR_UNREAD_SQL, CONVERSATION_PAGE_SQL, CONVERSATION_SINCE_SQL, CONVERSATION_VERSION_SQL, COUNT_UNREAD_SQL,
+    EXCHANGE_BROWSE_SQL, FEED_GENERATION_SQL, FEED_LIKED_SQL, FEED_PAGE_SQL, FRIENDS_SQL, HAS_UNREAD_SQL, LIKE_COUNT_SQL,
+    LIKE_COUNT_UPDATE_SQL, LIKE_DELETE_SQL, LIKE_INSERT_SQL, MARK_READ_SQL, MESSAGE_TIMESTAMP_SQL,
+    POST_LIKE_COUNT_SQL, POST_LIKED_SQL, SEARCH_FIRST_USERS_SQL, SEARCH_USERNAME_PREFIX_SQL,
+    SEARCH_USERS_TRIGRAM_SQL, SEARCH_WITH_FRIENDSHIP_SQL, UNREAD_COUNTERS_SQL
+)
+from translation_cache import TranslationCache
+from async_runner import BATCH_CONCURRENCY, BackgroundLoop, TranslatorPool, translate_batch, translation_error_response
+from whisper_pool import WhisperPool, TranscriptionRejected
+from streaming import StreamManager
+from pubsub import PubSubHub
+from feed_cache import FeedCache, original_id
+from exchange_matcher import BROWSE_MODE, MATCH_MODE, ExchangeMatcher, decode_match_cursor, encode_match_cursor, parse_languages
+from audio import AudioDecodeError, decode_audio
+from tts_cache import TTSCache, audio_key
+from vad import VoiceActivityDetector
+from concurrent.futures import Future
 import sqlite3
 import os
 import asyncio
-import whisper
-from googletrans import Translator
+import atexit
+import json
+import queue
+import re
+import sys
+import threading
 from gtts import gTTS
-import tempfile
-import base64
 from functools import wraps
 import time
 
@@ -36,65 +56,264 @@ CORS(app,
 # Initialize the database
 init_db()
 
+#mp3 parts a speech stream buffers ahead of a slow client before synthesis waits
+SPEECH_STREAM_BUFFER_PARTS = 16
+
 class SpeechTranslator:
-    #init for the translator object
-    def __init__(self, target_language='en', model_size='base'):
-        print("Loading Whisper...")
-        self.whisper_model = whisper.load_model(model_size)
-        self.translator = Translator()
-        self.target_language = target_language
-
-    #whisper for stt
-    def transcribe_audio(self, audio_file):
-        print("Transcribing audio...")
-        result = self.whisper_model.transcribe(audio_file)
-        return result["text"]
+    """Shared speech/translation helper.
+
+    The language is passed on every call; instances hold no per-request state,
+    so one instance can serve many threads at once.
+    """
 
-    async def translate_text(self, text, max_retries=3):
-        """Translate text with retry logic"""
-        for attempt in range(max_retries):
+    #init for the translator object
+    def __init__(self, default_language='en', model_size='base', cache=None, translator_pool=None, whisper_pool=None, vad=None):
+        self.whisper_pool = whisper_pool if whisper_pool is not None else WhisperPool(model_size=model_size)
+        self.vad = vad
+        self.translator_pool = translator_pool if translator_pool is not None else TranslatorPool()
+        self.cache = cache if cache is not None else TranslationCache()
+        self._default_language = default_language
+
+    @property
+    def default_language(self):
+        return self._default_language
+
+    #whisper for stt, run on the worker process pool
+    def submit_transcription(self, audio):
+        """Queue a 16 kHz float32 sample array and return a Future for its text.
+
+        Silence is trimmed first; clips with no speech resolve to '' without
+        touching the pool, and long clips are split at pauses so the chunks
+        are transcribed by several workers at once.
+        """
+        chunks = self.vad.split(audio) if self.vad is not None else [audio]
+        if not chunks:
+            result = Future()
+            result.set_result('')
+            return result
+
+        #admitted as one request, so a rejection never leaves some chunks running
+        futures = self.whisper_pool.submit_all(chunks)
+        if len(futures) == 1:
+            return futures[0]
+
+        #join the chunk texts in order once every chunk is done; fail on the first error
+        result = Future()
+        remaining = [len(futures)]
+        finished = [False]
+        lock = threading.Lock()
+
+        def chunk_error(future):
+            if not future.cancelled():
+                return future.exception()
+            #a failed chunk cancels the ones still queued; report that failure if there is one
+            for other in futures:
+                if other.done() and not other.cancelled() and other.exception() is not None:
+                    return other.exception()
+            #cancelled on its own, e.g. by a pool shutdown
+            return TranscriptionRejected('Transcription was cancelled', 503, 1)
+
+        def on_done(future):
+            error = chunk_error(future)
+            with lock:
+                if finished[0]:
+                    return
+                remaining[0] -= 1
+                if error is None and remaining[0]:
+                    return
+                finished[0] = True
+            if error is not None:
+                result.set_exception(error)
+                return
             try:
-                print(f"Translating to {self.target_language}... (attempt {attempt + 1}/{max_retries})")
-                
-                # Create a fresh translator instance on each retry
-                if attempt > 0:
-                    self.translator = Translator()
-                    await asyncio.sleep(1)  # Wait 1 second before retry
-                
-                translation = await self.translator.translate(
-                    text,
-                    dest=self.target_language
-                )
-                
-                # Check if translation text is valid
-                if translation and translation.text:
-                    return translation.text
-                else:
-                    raise Exception("Empty translation received")
+                result.set_result(' '.join(f.result().strip() for f in futures).strip())
+            except BaseException as e:
+                #never leave the joined future unresolved
+                result.set_exception(e)
+
+        for future in futures:
+            future.add_done_callback(on_done)
+        return result
+
+    def transcribe_audio(self, audio):
+        """Transcribe a 16 kHz float32 sample array"""
+        print("Transcribing audio...")
+        return self.submit_transcription(audio).result()
+
+    async def translate_text(self, text, max_retries=3, src='auto', dest=None):
+        """Translate text with retry logic, serving repeats from the cache"""
+        dest = dest or self._default_language
+        #the cache may touch SQLite, so keep it off the shared event loop
+        cached = await asyncio.to_thread(self.cache.get, text, src, dest)
+        if cached is not None:
+            return cached
+
+        async with self.translator_pool.acquire() as lease:
+            for attempt in range(max_retries):
+                try:
+                    print(f"Translating to {dest}... (attempt {attempt + 1}/{max_retries})")
                     
-            except Exception as e:
-                print(f"Translation attempt {attempt + 1} failed: {str(e)}")
-                
-                if attempt == max_retries - 1:
-                    raise Exception(f"Translation failed after {max_retries} attempts: {str(e)}")
-                
-                await asyncio.sleep(2 ** attempt)
+                    # Swap in a fresh pooled client on each retry
+                    if attempt > 0:
+                        await lease.refresh()
+                        await asyncio.sleep(1)  # Wait 1 second before retry
+                    
+                    translation = await lease.translator.translate(
+                        text,
+                        src=src,
+                        dest=dest
+                    )
+
+                    # Check if translation text is valid
+                    if translation and translation.text:
+                        await asyncio.to_thread(self.cache.set, text, src, dest, translation.text)
+                        return translation.text
+                    else:
+                        raise Exception("Empty translation received")
+                        
+                except Exception as e:
+                    print(f"Translation attempt {attempt + 1} failed: {str(e)}")
+                    
+                    if attempt == max_retries - 1:
+                        raise Exception(f"Translation failed after {max_retries} attempts: {str(e)}")
+                    
+                    await asyncio.sleep(2 ** attempt)
         
         raise Exception("Translation failed")
 
-    def text_to_speech(self, text, output_file):
+    def text_to_speech(self, text, output_file, lang=None):
         print("Generating speech...")
-        tts = gTTS(text=text, lang=self.target_language)
-        tts.save(output_file)
-
-#create global speech translator instance
-speech_translator = SpeechTranslator(target_language='en', model_size='base')
+        tts = gTTS(text=text, lang=lang or self._default_language)
+        with open(output_file, 'wb') as f:
+            tts.write_to_fp(f)
+
+    def stream_speech(self, text, lang=None):
+        """Yield mp3 bytes as gTTS synthesizes each part of the text"""
+        print("Streaming speech...")
+        chunks = queue.Queue(maxsize=SPEECH_STREAM_BUFFER_PARTS)
+        #set when the consumer goes away, so synthesis stops instead of buffering for nobody
+        stopped = threading.Event()
+
+        def deliver(item):
+            #wait for room while the client is behind; False once it has gone
+            while not stopped.is_set():
+                try:
+                    chunks.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        class QueueWriter:
+            #file-like object that hands each written part to the generator
+            def write(self, data):
+                if not deliver(bytes(data)):
+                    raise RuntimeError('Speech stream closed by the client')
+
+        def synthesize():
+            try:
+                gTTS(text=text, lang=lang or self._default_language).write_to_fp(QueueWriter())
+            except Exception as e:
+                deliver(e)
+            finally:
+                deliver(None)
 
-def async_route(f):
-    @wraps(f)
-    def wrapped(*args, **kwargs):
-        return asyncio.run(f(*args, **kwargs))
-    return wrapped
+        threading.Thread(target=synthesize, daemon=True).start()
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    return
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            stopped.set()
+
+#start the whisper worker processes before any background threads exist;
+#torch/whisper are only imported inside the workers, which load their models
+#in the background while Flask is already serving
+WHISPER_MODEL = os.environ.get('WHISPER_MODEL', 'base')
+whisper_pool = WhisperPool(
+    model_size=WHISPER_MODEL,
+    workers=int(os.environ.get('WHISPER_WORKERS', 0)) or None,
+    threads_per_worker=int(os.environ.get('WHISPER_THREADS_PER_WORKER', 0)) or None,
+    max_queue=int(os.environ.get('WHISPER_QUEUE_SIZE', 0)) or None,
+    default_deadline=float(os.environ.get('WHISPER_JOB_DEADLINE', 30)),
+    mode=os.environ.get('WHISPER_INFERENCE_MODE', 'standard'),
+    max_beam_size=int(os.environ.get('WHISPER_MAX_BEAM_SIZE', 0)) or None
+)
+whisper_pool.warmup()
+atexit.register(whisper_pool.shutdown)
+
+#silence trimming in front of whisper; VAD_ENABLED=0 sends audio through untouched
+vad = VoiceActivityDetector(
+    split_seconds=float(os.environ.get('VAD_SPLIT_SECONDS', 30))
+) if os.environ.get('VAD_ENABLED', '1') != '0' else None
+
+#create global translation cache and speech translator instance
+translation_cache = TranslationCache(
+    max_entries=int(os.environ.get('TRANSLATION_CACHE_SIZE', 5000)),
+    ttl_seconds=int(os.environ.get('TRANSLATION_CACHE_TTL', 60 * 60 * 24))
+)
+
+#content-addressed cache of generated speech
+TTS_CACHE_DIR = os.environ.get('TTS_CACHE_DIR', os.path.join(BASE_DIR, 'tts_cache'))
+TTS_MAX_AGE = 60 * 60 * 24 * 365
+tts_cache = TTSCache(
+    TTS_CACHE_DIR,
+    max_bytes=int(os.environ.get('TTS_CACHE_MAX_MB', 256)) * 1024 * 1024
+)
+
+#long-lived event loop that owns the pooled googletrans clients
+background_loop = BackgroundLoop()
+translator_pool = TranslatorPool(size=int(os.environ.get('TRANSLATOR_POOL_SIZE', 4)))
+background_loop.add_shutdown_hook(translator_pool.close)
+atexit.register(background_loop.shutdown)
+
+speech_translator = SpeechTranslator(
+    default_language='en',
+    model_size=WHISPER_MODEL,
+    cache=translation_cache,
+    translator_pool=translator_pool,
+    whisper_pool=whisper_pool,
+    vad=vad
+)
+
+#live transcription sessions for the streaming translator
+def transcribe_window(audio):
+    #a silent window needs no whisper pass; an empty result lets the session commit past it
+    if vad is not None and not vad.has_speech(audio):
+        return {'text': '', 'segments': []}
+    return whisper_pool.transcribe(audio, with_segments=True)
+
+stream_manager = StreamManager(
+    transcribe=transcribe_window,
+    translate=lambda text, lang: background_loop.run(speech_translator.translate_text(text, dest=lang))
+)
+atexit.register(stream_manager.shutdown)
+
+def synthesize_speech(text, lang, output_path):
+    speech_translator.text_to_speech(text, output_path, lang=lang)
+
+def tts_url(key):
+    return f'/api/tts/{key}.mp3'
+
+def sse_event(event, payload):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def split_sentences(text):
+    """Split text at sentence-ending punctuation so stages can run per sentence"""
+    sentences = [s.strip() for s in re.split(r'(?<=[.!?\u3002\uff01\uff1f])\s+', text)]
+    return [s for s in sentences if s]
+
+def rejected_response(error):
+    """Turn an overloaded transcription queue into a 429/503 with Retry-After"""
+    response = jsonify({'error': error.message, 'retry_after': error.retry_after})
+    response.status_code = error.status
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
 
 #speech/translation endpoints
 @app.route('/api/transcribe', methods=['POST'])
@@ -105,27 +324,29 @@ def transcribe():
         if 'audio' not in request.files:
             return jsonify({'error': 'No audio file provided'}), 400
         
-        audio_file = request.files['audio']
-        
-        #save audio to a temporary file
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp:
-            audio_path = tmp.name
-            audio_file.save(audio_path)
+        #decode the upload in memory
+        audio = decode_audio(request.files['audio'].stream)
         
         #transcribe audio
-        text = speech_translator.transcribe_audio(audio_path)
-        
-        #remove temporary file
-        os.remove(audio_path)
+        text = speech_translator.transcribe_audio(audio)
         
         return jsonify({'text': text})
     
+    except AudioDecodeError as e:
+        return jsonify({'error': str(e)}), 400
+    except TranscriptionRejected as e:
+        return rejected_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+#limit for batch translation requests
+MAX_BATCH_ITEMS = 100
+
+#views read and parse the request body on their own worker thread and only hand the
+#parsed values to the shared background loop; reading a slow upload there would stall
+#every other request waiting on the loop
 @app.route('/api/translate', methods=['POST'])
-@async_route
-async def translate():
+def translate():
     """Translate text to target language"""
     try:
         #parse request data
@@ -142,21 +363,56 @@ async def translate():
         
         print(f"Translating '{text[:50]}...' to {target_lang}")
         
-        #update translator and language translate
-        speech_translator.target_language = target_lang
-        translated_text = await speech_translator.translate_text(text)
+        #translate through the shared batch path
+        result = background_loop.run(translate_batch(speech_translator.translate_text, [(text, target_lang)]))[0]
+        if result['status'] != 'ok':
+            return jsonify({'error': result['error']}), result['code']
         
-        return jsonify({'translated_text': translated_text})
+        return jsonify({'translated_text': result['translated_text']})
     
     except Exception as e:
         error_msg = str(e)
         print(f"Translation error: {error_msg}")
-        
-        #Handle JSON decode errors
-        if "JSONDecodeError" in error_msg or "Expecting value" in error_msg:
-            return jsonify({'error': 'Translation service temporarily unavailable. Please try again.'}), 503
-        else:
-            return jsonify({'error': f'Translation failed: {error_msg}'}), 500
+        error, status = translation_error_response(error_msg)
+        return jsonify(error), status
+
+@app.route('/api/translate/batch', methods=['POST'])
+def translate_batch_route():
+    """Translate a list of texts, each to its own or a shared target language"""
+    try:
+        #parse request data
+        data = request.get_json() or {}
+        texts = data.get('texts')
+        default_lang = data.get('target_language', 'en')
+
+        #validate input
+        if not isinstance(texts, list) or not texts:
+            return jsonify({'error': 'No texts provided'}), 400
+
+        if len(texts) > MAX_BATCH_ITEMS:
+            return jsonify({'error': f'Too many texts (max {MAX_BATCH_ITEMS})'}), 400
+
+        #each entry is either a string or {"text": ..., "target_language": ...}
+        items = []
+        for entry in texts:
+            if isinstance(entry, dict):
+                text = entry.get('text')
+                target_lang = entry.get('target_language') or default_lang
+            else:
+                text = entry
+                target_lang = default_lang
+
+            if not isinstance(text, str) or not text.strip() or not target_lang:
+                return jsonify({'error': 'Every item needs text and a target language'}), 400
+            items.append((text, target_lang))
+
+        print(f"Batch translating {len(items)} texts")
+        results = background_loop.run(translate_batch(speech_translator.translate_text, items))
+
+        return jsonify({'results': results})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @app.route('/api/text-to-speech', methods=['POST'])
 def text_to_speech():
@@ -166,91 +422,296 @@ def text_to_speech():
         data = request.get_json()
         text = data.get('text')
         lang = data.get('language', 'en')
+        stream = data.get('stream', False)
         
         #validate input
         if not text:
             return jsonify({'error': 'No text provided'}), 400
         
-        #create temporary file for audio
-        with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as tmp:
-            output_path = tmp.name
-        
-        #generate speech
-        speech_translator.target_language = lang
-        speech_translator.text_to_speech(text, output_path)
+        #for streaming, hand back a URL that synthesizes while it plays
+        if stream and not tts_cache.has(audio_key(text, lang)):
+            key = tts_cache.remember_request(text, lang)
+            return jsonify({'audio_url': f'/api/tts/stream/{key}'})
         
-        #read and encode audio file to base64
-        with open(output_path, 'rb') as f:
-            audio_data = base64.b64encode(f.read()).decode('utf-8')
+        #generate speech, or reuse it if this text was spoken before
+        key = tts_cache.get_or_create(text, lang, synthesize_speech)
         
-        #remove temporary file
-        os.remove(output_path)
-        
-        return jsonify({'audio': audio_data})
+        return jsonify({'audio_url': tts_url(key)})
     
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/tts/<key>.mp3', methods=['GET'])
+def tts_audio(key):
+    """Serve cached speech as mp3; the URL is content-addressed so it never changes"""
+    #open before sending so an eviction in between can't turn the hit into an error
+    audio_file = tts_cache.open(key)
+    if audio_file is None:
+        return jsonify({'error': 'Audio not found'}), 404
+    return send_cached_audio(audio_file, key)
+
+def send_cached_audio(audio_file, key):
+    response = send_file(
+        audio_file,
+        mimetype='audio/mpeg',
+        etag=key,
+        max_age=TTS_MAX_AGE,
+        conditional=True
+    )
+    response.headers['Cache-Control'] = f'public, max-age={TTS_MAX_AGE}, immutable'
+    return response
+
+@app.route('/api/tts/stream/<key>', methods=['GET'])
+def tts_stream(key):
+    """Stream speech as chunked mp3 while gTTS synthesizes it part by part"""
+    #already synthesized: serve the cached file
+    audio_file = tts_cache.open(key)
+    if audio_file is not None:
+        return send_cached_audio(audio_file, key)
+
+    pending = tts_cache.lookup_request(key)
+    if not pending:
+        return jsonify({'error': 'Audio not found'}), 404
+    text, lang = pending
+
+    def generate():
+        speech = speech_translator.stream_speech(text, lang)
+        parts = []
+        try:
+            for chunk in speech:
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            print(f"TTS stream error: {e}")
+            return
+        finally:
+            #on a client disconnect this stops synthesis instead of leaving it buffering
+            speech.close()
+        #only reached once synthesis completed, so a cut-off stream is never cached
+        tts_cache.put(key, b''.join(parts))
+
+    return Response(generate(), mimetype='audio/mpeg', headers={'Cache-Control': 'no-cache'})
+
+async def run_full_translation(audio, target_lang):
+    """Transcribe, translate and speak decoded audio; returns the response fields"""
+    #transcribe audio off the event loop
+    original_text = await asyncio.to_thread(speech_translator.transcribe_audio, audio)
+    print(f"\nOriginal text: {original_text}")
+
+    #translate text
+    translated_text = await speech_translator.translate_text(original_text, dest=target_lang)
+    print(f"Translated text: {translated_text}\n")
+
+    #convert translation to cached speech off the event loop
+    key = await asyncio.to_thread(tts_cache.get_or_create, translated_text, target_lang, synthesize_speech)
+
+    return {
+        'original_text': original_text,
+        'translated_text': translated_text,
+        'audio_url': tts_url(key)
+    }
+
 @app.route('/api/full-translation', methods=['POST'])
-@async_route
-async def full_translation():
+def full_translation():
     """Complete pipeline: audio -> transcribe -> translate -> TTS"""
     try:
         #validate audio file present
         if 'audio' not in request.files:
             return jsonify({'error': 'No audio file provided'}), 400
         
-        audio_file = request.files['audio']
         target_lang = request.form.get('target_language', 'en')
         
-        #create temporary files for input audio and output speech
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_audio:
-            audio_path = tmp_audio.name
-            audio_file.save(audio_path)
+        #read and decode the upload here, before anything runs on the shared loop
+        audio = decode_audio(request.files['audio'].stream)
+
+        return jsonify(background_loop.run(run_full_translation(audio, target_lang)))
+    
+    except AudioDecodeError as e:
+        return jsonify({'error': str(e)}), 400
+    except TranscriptionRejected as e:
+        return rejected_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as tmp_output:
-            output_path = tmp_output.name
+async def translate_and_speak(sentences, target_lang, emit, concurrency=BATCH_CONCURRENCY):
+    """Translate then synthesize each sentence, overlapping the stages across sentences"""
+    semaphore = asyncio.Semaphore(concurrency)
 
+    async def handle(index, sentence):
+        async with semaphore:
+            try:
+                translated_text = await speech_translator.translate_text(sentence, dest=target_lang)
+                emit('translated_text', {'index': index, 'text': translated_text})
+            except Exception as e:
+                emit('error', {'index': index, 'stage': 'translate', 'error': str(e)})
+                return None
+
+        #speech for this sentence runs while later sentences are still translating
         try:
-            #set target language
-            speech_translator.target_language = target_lang
-            
-            #transcribe audio
-            original_text = speech_translator.transcribe_audio(audio_path)
-            print(f"\nOriginal text: {original_text}")
-
-            #translate text
-            translated_text = await speech_translator.translate_text(original_text)
-            print(f"Translated text: {translated_text}\n")
-
-            #convert translation to speech
-            speech_translator.text_to_speech(translated_text, output_path)
-            
-            #encode audio as base64
-            with open(output_path, 'rb') as f:
-                audio_data = base64.b64encode(f.read()).decode('utf-8')
-            
-            return jsonify({
-                'original_text': original_text,
-                'translated_text': translated_text,
-                'audio': audio_data
-            })
-        
-        finally:
-            #cleanup temporary files
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
-            if os.path.exists(output_path):
-                os.remove(output_path)
-    
+            key = await asyncio.to_thread(tts_cache.get_or_create, translated_text, target_lang, synthesize_speech)
+            emit('audio', {'index': index, 'audio_url': tts_url(key)})
+        except Exception as e:
+            emit('error', {'index': index, 'stage': 'tts', 'error': str(e)})
+        return translated_text
+
+    return await asyncio.gather(*(handle(i, s) for i, s in enumerate(sentences)))
+
+@app.route('/api/full-translation/stream', methods=['POST'])
+def full_translation_stream():
+    """Pipeline as Server-Sent Events: original text, then per-sentence translations and audio"""
+    try:
+        #validate audio file present
+        if 'audio' not in request.files:
+            return jsonify({'error': 'No audio file provided'}), 400
+
+        target_lang = request.form.get('target_language', 'en')
+        audio = decode_audio(request.files['audio'].stream)
+
+        #admission control happens before any bytes are streamed
+        transcription = speech_translator.submit_transcription(audio)
+    except AudioDecodeError as e:
+        return jsonify({'error': str(e)}), 400
+    except TranscriptionRejected as e:
+        return rejected_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+    def generate():
+        try:
+            original_text = transcription.result()
+        except Exception as e:
+            yield sse_event('error', {'stage': 'transcribe', 'error': str(e)})
+            return
+
+        sentences = split_sentences(original_text)
+        yield sse_event('original_text', {'text': original_text, 'sentences': len(sentences)})
+
+        #run the translate/TTS stages on the shared loop and relay their events
+        events = queue.Queue()
+        pipeline = background_loop.submit(
+            translate_and_speak(sentences, target_lang, lambda event, payload: events.put((event, payload)))
+        )
+        pipeline.add_done_callback(lambda _: events.put(None))
+
+        while True:
+            item = events.get()
+            if item is None:
+                break
+            yield sse_event(*item)
+
+        try:
+            translations = pipeline.result()
+        except Exception as e:
+            yield sse_event('error', {'stage': 'pipeline', 'error': str(e)})
+            return
+        yield sse_event('done', {
+            'translated_text': ' '.join(t for t in translations if t)
+        })
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+#streaming transcription endpoints
+@app.route('/api/stream', methods=['POST'])
+def start_stream():
+    """Open a live transcription session"""
+    data = request.get_json(silent=True) or {}
+    target_lang = data.get('target_language', 'en')
+
+    try:
+        stream = stream_manager.create(target_lang)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({'stream_id': stream.stream_id})
+
+@app.route('/api/stream/<stream_id>/audio', methods=['POST'])
+def stream_audio(stream_id):
+    """Append a chunk of recorded audio to a live session"""
+    stream = stream_manager.get(stream_id)
+    if not stream:
+        return jsonify({'error': 'Stream not found'}), 404
+
+    chunk = request.get_data()
+    if not chunk:
+        return jsonify({'error': 'No audio data provided'}), 400
+
+    try:
+        stream.feed(chunk)
+    except (BrokenPipeError, ValueError):
+        return jsonify({'error': 'Stream is closed'}), 409
+
+    return jsonify({'success': True})
+
+@app.route('/api/stream/<stream_id>/end', methods=['POST'])
+def end_stream(stream_id):
+    """Finish a live session; the final transcript follows on the event stream"""
+    stream = stream_manager.get(stream_id)
+    if not stream:
+        return jsonify({'error': 'Stream not found'}), 404
+
+    stream.end()
+    return jsonify({'success': True})
+
+@app.route('/api/stream/<stream_id>/events', methods=['GET'])
+def stream_events(stream_id):
+    """Push partial and final transcripts with translations as Server-Sent Events"""
+    stream = stream_manager.get(stream_id)
+    if not stream:
+        return jsonify({'error': 'Stream not found'}), 404
+
+    def generate():
+        try:
+            while True:
+                try:
+                    event, payload = stream.events.get(timeout=15)
+                except queue.Empty:
+                    #keep proxies from closing an idle connection
+                    yield ': keep-alive\n\n'
+                    continue
+
+                yield sse_event(event, payload)
+                if event in ('done', 'error'):
+                    break
+        finally:
+            stream_manager.remove(stream_id)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 #utility endpoints
 @app.route('/health', methods=['GET'])
 def health():
+    #liveness: the web process is up, even if models are still loading
     return jsonify({'status': 'healthy'})
 
+@app.route('/health/ready', methods=['GET'])
+def health_ready():
+    """Readiness: 200 once a Whisper worker has its model loaded, 503 before"""
+    status = whisper_pool.status()
+    return jsonify({'status': 'ready' if status['ready'] else 'loading', 'whisper': status}), (200 if status['ready'] else 503)
+
+@app.route('/api/transcribe/metrics', methods=['GET'])
+def transcription_metrics():
+    """Report transcription queue depth, rejections, wait times and audio dropped as silence"""
+    metrics = whisper_pool.metrics()
+    metrics['vad'] = vad.stats() if vad is not None else None
+    return jsonify(metrics)
+
+@app.route('/api/tts/cache-stats', methods=['GET'])
+def tts_cache_stats():
+    """Report speech cache hits, misses, evictions and disk usage"""
+    return jsonify(tts_cache.stats())
+
+@app.route('/api/translate/cache-stats', methods=['GET'])
+def translation_cache_stats():
+    """Report translation cache hit/miss/eviction counters"""
+    return jsonify(translation_cache.stats())
+
 @app.route('/')
 def index():
     return send_from_directory(FRONTEND_DIR, 'index.html')
@@ -283,14 +744,13 @@ def signup():
     
     try:
         #insert new user into database
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            'INSERT INTO users (fullname, email, username, password_hash) VALUES (?, ?, ?, ?)',
-            (fullname, email, username, password_hash)
-        )
-        conn.commit()
-        conn.close()
+        with db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'INSERT INTO users (fullname, email, username, password_hash) VALUES (?, ?, ?, ?)',
+                (fullname, email, username, password_hash)
+            )
+            conn.commit()
         return jsonify({'success': True, 'message': 'Account created successfully'})
     except sqlite3.IntegrityError:
         return jsonify({'success': False, 'message': 'Username or email already exists'}), 400
@@ -309,13 +769,12 @@ def login():
     password_hash = hash_password(password)
     
     #check credentials in database
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    user = cursor.execute(
-        'SELECT * FROM users WHERE username = ? AND password_hash = ?',
-        (username, password_hash)
-    ).fetchone()
-    conn.close()
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        user = cursor.execute(
+            'SELECT * FROM users WHERE username = ? AND password_hash = ?',
+            (username, password_hash)
+        ).fetchone()
     
     if user:
         #store user info in session
@@ -359,32 +818,48 @@ def forgot_password():
         return jsonify({'success': False, 'message': 'Password must be at least 8 characters'}), 400
     
     #find user and update password
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    user = cursor.execute(
-        'SELECT * FROM users WHERE email = ? AND username = ?',
-        (email, username)
-    ).fetchone()
-    
-    if not user:
-        conn.close()
-        return jsonify({'success': False, 'message': 'No account found with that email and username'}), 404
-    
-    new_password_hash = hash_password(new_password)
-    cursor.execute(
-        'UPDATE users SET password_hash = ? WHERE id = ?',
-        (new_password_hash, user['id'])
-    )
-    conn.commit()
-    conn.close()
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        user = cursor.execute(
+            'SELECT * FROM users WHERE email = ? AND username = ?',
+            (email, username)
+        ).fetchone()
+    
+        if not user:
+            return jsonify({'success': False, 'message': 'No account found with that email and username'}), 404
+    
+        new_password_hash = hash_password(new_password)
+        cursor.execute(
+            'UPDATE users SET password_hash = ? WHERE id = ?',
+            (new_password_hash, user['id'])
+        )
+        conn.commit()
     
     return jsonify({'success': True, 'message': 'Password reset successfully'})
 
 # ========== MESSAGING ENDPOINTS ==========
 
+#shortest query the trigram index can answer
+MIN_TRIGRAM_QUERY = 3
+SEARCH_PAGE_SIZE = 20
+
+def friendship_status(status_out, status_in):
+    """Combine the friendship rows in each direction into one status"""
+    if status_out == 'accepted' or status_in == 'accepted':
+        return 'friends'
+    if status_out == 'pending':
+        # Both sent requests
+        return 'friends' if status_in == 'pending' else 'request_sent'
+    if status_in == 'pending':
+        return 'request_received'
+    return 'none'
+
+def escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
 @app.route('/search-users', methods=['GET'])
 def search_users():
-    """Search for users by username"""
+    """Search for users by username or full name"""
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'}), 401
     
@@ -392,66 +867,36 @@ def search_users():
     query = request.args.get('query', '').strip().lower()
     
     user_id = session['user_id']
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # If query is empty or too short, show all users (excluding self)
+
+    # Pick the page of matching users; each branch reads an index, never the whole table
     if len(query) == 0:
-        users = cursor.execute('''
-            SELECT id, username, fullname 
-            FROM users 
-            WHERE id != ?
-            ORDER BY username
-            LIMIT 20
-        ''', (user_id,)).fetchall()
+        # Empty query: show the first users alphabetically (excluding self)
+        page_sql = SEARCH_FIRST_USERS_SQL
+        params = (user_id, SEARCH_PAGE_SIZE)
+    elif len(query) < MIN_TRIGRAM_QUERY:
+        # Too short for trigrams: match the start of the username
+        page_sql = SEARCH_USERNAME_PREFIX_SQL
+        params = (escape_like(query) + '%', user_id, SEARCH_PAGE_SIZE)
     else:
-        # Search for users whose username contains the query (case-insensitive)
-        users = cursor.execute('''
-            SELECT id, username, fullname 
-            FROM users 
-            WHERE LOWER(username) LIKE ? AND id != ?
-            ORDER BY username
-            LIMIT 20
-        ''', (f'%{query}%', user_id)).fetchall()
+        # Substring match on username or full name through the trigram index
+        page_sql = SEARCH_USERS_TRIGRAM_SQL
+        params = ('"' + query.replace('"', '""') + '"', user_id, SEARCH_PAGE_SIZE)
+
+    with db_connection() as conn:
+        # Resolve friendship status for the whole page in the same query
+        users = conn.execute(
+            SEARCH_WITH_FRIENDSHIP_SQL.format(page_sql=page_sql), params + (user_id, user_id)
+        ).fetchall()
     
     print(f"Found {len(users)} users matching '{query}'")
     
-    # For each user, check friendship status
-    results = []
-    for user in users:
-        # Check if already friends or request pending
-        friendship_out = cursor.execute(
-            'SELECT status FROM friendships WHERE user_id = ? AND friend_id = ?',
-            (user_id, user['id'])
-        ).fetchone()
-        
-        friendship_in = cursor.execute(
-            'SELECT status FROM friendships WHERE user_id = ? AND friend_id = ?',
-            (user['id'], user_id)
-        ).fetchone()
-        
-        # Determine friendship status
-        status = 'none'
-        if friendship_out and friendship_out['status'] == 'accepted':
-            status = 'friends'
-        elif friendship_in and friendship_in['status'] == 'accepted':
-            status = 'friends'
-        elif friendship_out and friendship_out['status'] == 'pending':
-            if friendship_in and friendship_in['status'] == 'pending':
-                status = 'friends'  # Both sent requests
-            else:
-                status = 'request_sent'
-        elif friendship_in and friendship_in['status'] == 'pending':
-            status = 'request_received'
-        
-        results.append({
-            'id': user['id'],
-            'username': user['username'],
-            'fullname': user['fullname'],
-            'friendship_status': status
-        })
+    results = [{
+        'id': user['id'],
+        'username': user['username'],
+        'fullname': user['fullname'],
+        'friendship_status': friendship_status(user['status_out'], user['status_in'])
+    } for user in sorted(users, key=lambda user: user['username'].lower())]
     
-    conn.close()
     print(f"Returning {len(results)} results")
     return jsonify({'success': True, 'users': results})
 
@@ -463,30 +908,20 @@ def get_friends():
         return jsonify({'success': False, 'message': 'Not logged in'}), 401
     
     user_id = session['user_id']
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get accepted friendships - need to check both directions but avoid duplicates
-    friends = cursor.execute('''
-        SELECT DISTINCT u.id, u.username, u.fullname 
-        FROM users u
-        WHERE u.id IN (
-            SELECT CASE 
-                WHEN f.user_id = ? THEN f.friend_id
-                WHEN f.friend_id = ? THEN f.user_id
-            END as friend_user_id
-            FROM friendships f
-            WHERE (f.user_id = ? OR f.friend_id = ?)
-            AND f.status = 'accepted'
-        )
-        AND u.id != ?
-        ORDER BY u.username
-    ''', (user_id, user_id, user_id, user_id, user_id)).fetchall()
+    with db_connection() as conn:
+        cursor = conn.cursor()
+    
+        # Get accepted friendships - need to check both directions but avoid duplicates
+        friends = cursor.execute(FRIENDS_SQL, (user_id, user_id, user_id, user_id, user_id, user_id)).fetchall()
     
-    conn.close()
     
     #format friends list
-    friends_list = [{'id': f['id'], 'username': f['username'], 'fullname': f['fullname']} for f in friends]
+    friends_list = [{
+        'id': f['id'],
+        'username': f['username'],
+        'fullname': f['fullname'],
+        'unread_count': f['unread_count']
+    } for f in friends]
     return jsonify({'success': True, 'friends': friends_list})
 
 @app.route('/add-friend', methods=['POST'])
@@ -503,69 +938,130 @@ def add_friend():
         return jsonify({'success': False, 'message': 'Friend username required'}), 400
     
     user_id = session['user_id']
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    # Find friend by username
-    friend = cursor.execute('SELECT id FROM users WHERE username = ?', (friend_username,)).fetchone()
+        # Find friend by username
+        friend = cursor.execute('SELECT id FROM users WHERE username = ?', (friend_username,)).fetchone()
     
-    if not friend:
-        conn.close()
-        return jsonify({'success': False, 'message': 'User not found'}), 404
+        if not friend:
+            return jsonify({'success': False, 'message': 'User not found'}), 404
     
-    friend_id = friend['id']
+        friend_id = friend['id']
     
-    # Prevent adding oneself as friend
-    if friend_id == user_id:
-        conn.close()
-        return jsonify({'success': False, 'message': 'Cannot add yourself as friend'}), 400
+        # Prevent adding oneself as friend
+        if friend_id == user_id:
+            return jsonify({'success': False, 'message': 'Cannot add yourself as friend'}), 400
     
-    # Check if there's already a pending request from this user
-    existing_request = cursor.execute(
-        'SELECT * FROM friendships WHERE user_id = ? AND friend_id = ?',
-        (user_id, friend_id)
-    ).fetchone()
+        # Check if there's already a pending request from this user
+        existing_request = cursor.execute(
+            'SELECT * FROM friendships WHERE user_id = ? AND friend_id = ?',
+            (user_id, friend_id)
+        ).fetchone()
     
-    if existing_request:
-        conn.close()
-        if existing_request['status'] == 'accepted':
-            return jsonify({'success': False, 'message': 'Already friends'}), 400
-        else:
-            return jsonify({'success': False, 'message': 'Friend request already sent'}), 400
+        if existing_request:
+            if existing_request['status'] == 'accepted':
+                return jsonify({'success': False, 'message': 'Already friends'}), 400
+            else:
+                return jsonify({'success': False, 'message': 'Friend request already sent'}), 400
     
-    # Check if the other user has sent a request to us
-    reverse_request = cursor.execute(
-        'SELECT * FROM friendships WHERE user_id = ? AND friend_id = ?',
-        (friend_id, user_id)
-    ).fetchone()
+        # Check if the other user has sent a request to us
+        reverse_request = cursor.execute(
+            'SELECT * FROM friendships WHERE user_id = ? AND friend_id = ?',
+            (friend_id, user_id)
+        ).fetchone()
     
-    try:
-        if reverse_request and reverse_request['status'] == 'pending':
-            # Both users have now sent requests - accept ONLY the reverse request, don't create new one
-            cursor.execute(
-                'UPDATE friendships SET status = ? WHERE user_id = ? AND friend_id = ?',
-                ('accepted', friend_id, user_id)
-            )
-            # Also create the mirror friendship so queries work both ways
-            cursor.execute(
-                'INSERT INTO friendships (user_id, friend_id, status) VALUES (?, ?, ?)',
-                (user_id, friend_id, 'accepted')
-            )
-            conn.commit()
-            conn.close()
-            return jsonify({'success': True, 'message': 'Friend request accepted! You are now friends.'})
-        else:
-            # Create a pending request
-            cursor.execute(
-                'INSERT INTO friendships (user_id, friend_id, status) VALUES (?, ?, ?)',
-                (user_id, friend_id, 'pending')
-            )
-            conn.commit()
-            conn.close()
-            return jsonify({'success': True, 'message': 'Friend request sent'})
-    except sqlite3.IntegrityError:
-        conn.close()
-        return jsonify({'success': False, 'message': 'Database error occurred'}), 400
+        try:
+            if reverse_request and reverse_request['status'] == 'pending':
+                # Both users have now sent requests - accept ONLY the reverse request, don't create new one
+                cursor.execute(
+                    'UPDATE friendships SET status = ? WHERE user_id = ? AND friend_id = ?',
+                    ('accepted', friend_id, user_id)
+                )
+                # Also create the mirror friendship so queries work both ways
+                cursor.execute(
+                    'INSERT INTO friendships (user_id, friend_id, status) VALUES (?, ?, ?)',
+                    (user_id, friend_id, 'accepted')
+                )
+                conn.commit()
+                return jsonify({'success': True, 'message': 'Friend request accepted! You are now friends.'})
+            else:
+                # Create a pending request
+                cursor.execute(
+                    'INSERT INTO friendships (user_id, friend_id, status) VALUES (?, ?, ?)',
+                    (user_id, friend_id, 'pending')
+                )
+                conn.commit()
+                return jsonify({'success': True, 'message': 'Friend request sent'})
+        except sqlite3.IntegrityError:
+            return jsonify({'success': False, 'message': 'Database error occurred'}), 400
+
+#fan-out of new chat messages and exchange board updates to open /events streams
+chat_hub = PubSubHub()
+EXCHANGE_REQUESTS_CHANNEL = 'exchange_requests'
+#comment line sent on idle streams so dead connections are noticed and proxies keep them open
+EVENTS_KEEPALIVE_SECONDS = 15
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+def publish_message(message_id, sender_id, receiver_id, message_text, timestamp):
+    """Push a stored message to both participants' open streams"""
+    payload = {
+        'id': message_id,
+        'sender_id': sender_id,
+        'receiver_id': receiver_id,
+        'message_text': message_text,
+        'timestamp': timestamp,
+        'sender_username': session.get('username')
+    }
+    chat_hub.publish(user_channel(receiver_id), 'message', payload)
+    #the sender's other tabs show it too
+    chat_hub.publish(user_channel(sender_id), 'message', payload)
+
+@app.route('/events', methods=['GET'])
+def events():
+    """Server-Sent Events stream of the logged-in user's new messages.
+
+    ``?topics=exchange_requests`` also subscribes to exchange board changes.
+    """
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'}), 401
+
+    channels = [user_channel(session['user_id'])]
+    if EXCHANGE_REQUESTS_CHANNEL in request.args.get('topics', '').split(','):
+        channels.append(EXCHANGE_REQUESTS_CHANNEL)
+    subscription = chat_hub.subscribe(channels)
+
+    def generate():
+        try:
+            #how long the browser waits before reconnecting a dropped stream
+            yield 'retry: 3000\n\n'
+            while True:
+                item = subscription.get(timeout=EVENTS_KEEPALIVE_SECONDS)
+                if item is not None:
+                    yield sse_event(*item)
+                elif subscription.closed:
+                    #fell too far behind; the client reconnects and catches up with since_id
+                    return
+                else:
+                    yield ': keepalive\n\n'
+        finally:
+            chat_hub.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/events/stats', methods=['GET'])
+def events_stats():
+    """Report open push streams and delivery counters"""
+    return jsonify(chat_hub.stats())
+
+def count_unread(conn, receiver_id, sender_id):
+    """Bump the receiver's unread counter; call inside the transaction that inserts the message"""
+    conn.execute(COUNT_UNREAD_SQL, (receiver_id, sender_id))
 
 @app.route('/send-message', methods=['POST'])
 def send_message():
@@ -582,35 +1078,39 @@ def send_message():
     #validate input
     if not receiver_id or not message_text:
         return jsonify({'success': False, 'message': 'Receiver ID and message text required'}), 400
+    try:
+        receiver_id = int(receiver_id)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid receiver ID'}), 400
     
     sender_id = session['user_id']
     
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    # Verify friendship exists
-    friendship = cursor.execute('''
-        SELECT * FROM friendships 
-        WHERE ((user_id = ? AND friend_id = ?) OR (user_id = ? AND friend_id = ?))
-        AND status = 'accepted'
-    ''', (sender_id, receiver_id, receiver_id, sender_id)).fetchone()
+        # Verify friendship exists
+        friendship = cursor.execute('''
+            SELECT * FROM friendships 
+            WHERE ((user_id = ? AND friend_id = ?) OR (user_id = ? AND friend_id = ?))
+            AND status = 'accepted'
+        ''', (sender_id, receiver_id, receiver_id, sender_id)).fetchone()
     
-    if not friendship:
-        conn.close()
-        return jsonify({'success': False, 'message': 'You are not friends with this user'}), 403
+        if not friendship:
+            return jsonify({'success': False, 'message': 'You are not friends with this user'}), 403
     
-    # Insert message
-    cursor.execute(
-        'INSERT INTO messages (sender_id, receiver_id, message_text) VALUES (?, ?, ?)',
-        (sender_id, receiver_id, message_text)
-    )
-    conn.commit()
+        # Insert message
+        cursor.execute(
+            'INSERT INTO messages (sender_id, receiver_id, message_text) VALUES (?, ?, ?)',
+            (sender_id, receiver_id, message_text)
+        )
+        message_id = cursor.lastrowid
+        count_unread(conn, receiver_id, sender_id)
+        conn.commit()
     
-    #get message ID and timestamp
-    message_id = cursor.lastrowid
-    timestamp = cursor.execute('SELECT timestamp FROM messages WHERE id = ?', (message_id,)).fetchone()['timestamp']
+        #get message timestamp
+        timestamp = cursor.execute(MESSAGE_TIMESTAMP_SQL, (message_id,)).fetchone()['timestamp']
     
-    conn.close()
+    publish_message(message_id, sender_id, receiver_id, message_text, timestamp)
     
     return jsonify({
         'success': True, 
@@ -619,100 +1119,244 @@ def send_message():
         'timestamp': timestamp
     })
 
+#page sizes for conversation history
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+
+def encode_cursor(timestamp, row_id):
+    return f"{timestamp}|{row_id}"
+
+def decode_cursor(value):
+    """Parse a 'timestamp|id' cursor; raises ValueError if malformed"""
+    timestamp, _, message_id = value.rpartition('|')
+    if not timestamp:
+        raise ValueError('Invalid cursor')
+    return timestamp, int(message_id)
+
+def page_args(default_limit=MESSAGE_PAGE_SIZE, max_limit=MAX_MESSAGE_PAGE_SIZE):
+    """Read the before/limit query parameters; raises ValueError if malformed"""
+    before = request.args.get('before')
+    limit = int(request.args.get('limit', default_limit))
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return (decode_cursor(before) if before else None), min(limit, max_limit)
+
+def fetch_conversation_page(conn, user_id, other_id, before=None, limit=MESSAGE_PAGE_SIZE):
+    """Return up to ``limit`` messages older than the ``before`` cursor, oldest first, and whether more exist.
+
+    Each direction of the conversation is read newest-first from the index and
+    cut at the limit before the two are merged, so the cost depends on the page
+    size, not on how long the conversation is.
+    """
+    #'~' sorts after any timestamp, so no cursor means "from the newest message"
+    timestamp, message_id = before or ('~', 0)
+    rows = conn.execute(CONVERSATION_PAGE_SQL, (
+        user_id, other_id, timestamp, message_id, limit + 1,
+        other_id, user_id, timestamp, message_id, limit + 1,
+        limit + 1
+    )).fetchall()
+    #the extra row only tells us whether an older page exists
+    return rows[:limit][::-1], len(rows) > limit
+
+def fetch_messages_since(conn, user_id, other_id, since_id, limit=MAX_MESSAGE_PAGE_SIZE):
+    """Return up to ``limit`` messages newer than message ``since_id``, oldest first, and whether more exist"""
+    anchor = conn.execute(MESSAGE_TIMESTAMP_SQL, (since_id,)).fetchone()
+    #'' sorts before any timestamp, so an unknown id means "from the start"
+    timestamp = anchor['timestamp'] if anchor else ''
+    rows = conn.execute(CONVERSATION_SINCE_SQL, (
+        user_id, other_id, timestamp, since_id, limit + 1,
+        other_id, user_id, timestamp, since_id, limit + 1,
+        limit + 1
+    )).fetchall()
+    return rows[:limit], len(rows) > limit
+
+def conversation_version(conn, user_id, other_id):
+    """Version string for a conversation; changes whenever a message is sent or read.
+
+    It is the newest message id plus how many messages each side has left
+    unread. A count only grows with a new message, which also moves the id,
+    so a version never repeats.
+    """
+    row = conn.execute(CONVERSATION_VERSION_SQL, (
+        user_id, other_id, other_id, user_id,
+        user_id, other_id,
+        other_id, user_id
+    )).fetchone()
+    return f"{row['newest'] or 0}.{row['unread_in']}.{row['unread_out']}"
+
+def page_response(messages, has_more, user_id, **extra):
+    """JSON body for a page of conversation history"""
+    return jsonify({
+        'success': True,
+        'messages': [{
+            'id': m['id'],
+            'sender_id': m['sender_id'],
+            'receiver_id': m['receiver_id'],
+            'message_text': m['message_text'],
+            'timestamp': m['timestamp'],
+            'read_status': m['read_status'],
+            'sender_username': m['sender_username'],
+            'is_mine': m['sender_id'] == user_id
+        } for m in messages],
+        'has_more': has_more,
+        #pass back as ?before= to load the previous page
+        'next_before': encode_cursor(messages[0]['timestamp'], messages[0]['id']) if has_more and messages else None,
+        **extra
+    })
+
+def conversation_response(user_id, other_id, mark_read=False):
+    """Serve a conversation as a history page (?before=), a delta (?since_id=) or its newest page.
+
+    The newest page and deltas carry the conversation version as their ETag;
+    a poll whose If-None-Match still matches gets an empty 304 and touches
+    nothing else.
+    """
+    try:
+        before, limit = page_args()
+        since_id = request.args.get('since_id')
+        since_id = int(since_id) if since_id is not None else None
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    with db_connection() as conn:
+        version = None
+        if before is None:
+            version = conversation_version(conn, user_id, other_id)
+            if request.if_none_match.contains(version):
+                response = Response(status=304)
+                response.set_etag(version)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+
+        if since_id is not None:
+            messages, has_newer = fetch_messages_since(conn, user_id, other_id, since_id, limit)
+            response = page_response(messages, False, user_id, has_newer=has_newer)
+        else:
+            messages, has_more = fetch_conversation_page(conn, user_id, other_id, before, limit)
+            response = page_response(messages, has_more, user_id)
+
+        # Mark messages as read, but only open a write transaction if any are unread
+        if mark_read and conn.execute(HAS_UNREAD_SQL, (user_id, other_id)).fetchone():
+            conn.execute(MARK_READ_SQL, (user_id, other_id))
+            conn.execute(CLEAR_UNREAD_SQL, (user_id, other_id))
+            conn.commit()
+            #reading changed the version; tag the response with the new one so the next poll matches
+            if version is not None:
+                version = conversation_version(conn, user_id, other_id)
+
+    if version is not None:
+        response.set_etag(version)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/get-messages/<int:friend_id>', methods=['GET'])
 def get_messages(friend_id):
-    """Get all messages between logged-in user and a specific friend"""
+    """Get messages between logged-in user and a specific friend (see conversation_response)"""
     #check if user is logged in
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'}), 401
     
-    user_id = session['user_id']
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get all messages between these two users
-    messages = cursor.execute('''
-        SELECT m.id, m.sender_id, m.receiver_id, m.message_text, m.timestamp, m.read_status,
-               u.username as sender_username
-        FROM messages m
-        JOIN users u ON m.sender_id = u.id
-        WHERE (m.sender_id = ? AND m.receiver_id = ?) 
-           OR (m.sender_id = ? AND m.receiver_id = ?)
-        ORDER BY m.timestamp ASC
-    ''', (user_id, friend_id, friend_id, user_id)).fetchall()
-    
-    # Mark messages as read
-    cursor.execute('''
-        UPDATE messages 
-        SET read_status = 1 
-        WHERE receiver_id = ? AND sender_id = ? AND read_status = 0
-    ''', (user_id, friend_id))
-    conn.commit()
-    conn.close()
-    
-    messages_list = [{
-        'id': m['id'],
-        'sender_id': m['sender_id'],
-        'receiver_id': m['receiver_id'],
-        'message_text': m['message_text'],
-        'timestamp': m['timestamp'],
-        'read_status': m['read_status'],
-        'sender_username': m['sender_username'],
-        'is_mine': m['sender_id'] == user_id
-    } for m in messages]
-    
-    return jsonify({'success': True, 'messages': messages_list})
+    return conversation_response(session['user_id'], friend_id, mark_read=True)
 
 @app.route('/unread-count', methods=['GET'])
 def unread_count():
-    """Get count of unread messages for logged-in user"""
+    """Get count of unread messages for logged-in user, in total and per sender"""
     #check if user is logged in
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'}), 401
     
     user_id = session['user_id']
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        # One counter row per conversation with unread messages
+        counters = conn.execute(UNREAD_COUNTERS_SQL, (user_id,)).fetchall()
     
-    # Count unread messages
-    count = cursor.execute(
-        'SELECT COUNT(*) as count FROM messages WHERE receiver_id = ? AND read_status = 0',
-        (user_id,)
-    ).fetchone()['count']
-    
-    conn.close()
-    
-    return jsonify({'success': True, 'unread_count': count})
+    by_friend = {str(c['sender_id']): c['unread'] for c in counters}
+    return jsonify({'success': True, 'unread_count': sum(by_friend.values()), 'by_friend': by_friend})
 
 # ========== SOCIAL POSTS ==========
 
+#page sizes for the social feed
+FEED_PAGE_SIZE = 20
+MAX_FEED_PAGE_SIZE = 100
+
+#recently served feed pages; FEED_CACHE_PAGES=0 turns the cache off
+feed_cache = FeedCache(max_pages=int(os.environ.get('FEED_CACHE_PAGES', 50)))
+
 @app.route("/posts", methods=["GET"])
 def get_posts():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Fetch posts along with original post details if reposted
-    cursor.execute("""
-        SELECT 
-            p.id,
-            p.author,
-            p.title,
-            p.content,
-            p.created_at,
-            p.reposted_from,
-            p.reposted_by,
-            orig.title AS original_title,
-            orig.content AS original_content,
-            orig.author AS original_author
-        FROM posts p
-        LEFT JOIN posts orig ON p.reposted_from = orig.id
-        ORDER BY p.created_at DESC
-    """)
-
-    #format posts
-    posts = [dict(row) for row in cursor.fetchall()]
-    conn.close()
-    return jsonify(posts)
+    """Get a page of the feed, newest first, with like counts and the caller's liked state.
+
+    Pages come from feed_cache when possible. The cache epoch, the database's
+    feed generation and the cache version (plus the caller, since "liked" is
+    personal) are the ETag, so an unchanged feed revalidates with an empty 304.
+    """
+    try:
+        before, limit = page_args(FEED_PAGE_SIZE, MAX_FEED_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    user_id = session.get('user_id')
+    with db_connection() as conn:
+        cursor = conn.cursor()
+
+        #a like count rebuild run outside the server moves the generation
+        generation = cursor.execute(FEED_GENERATION_SQL).fetchone()['generation']
+        feed_cache.sync_generation(generation)
+        version = feed_cache.version
+        etag = f"feed-{feed_cache.epoch}-{generation}-{version}-{user_id or 0}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+        page = feed_cache.get_page(before, limit)
+        if page is None:
+            #'~' sorts after any timestamp, so no cursor means "from the newest post"
+            created_at, post_id = before or ('~', 0)
+
+            # Fetch one page of posts along with original post details if reposted;
+            # like counts live on the original post
+            cursor.execute(FEED_PAGE_SQL, (created_at, post_id, limit + 1))
+
+            #format posts
+            posts = [dict(row) for row in cursor.fetchall()]
+
+            #the extra row only tells us whether an older page exists
+            has_more = len(posts) > limit
+            posts = posts[:limit]
+            page = {
+                'posts': posts,
+                'has_more': has_more,
+                #pass back as ?before= to load the next page
+                'next_before': encode_cursor(posts[-1]['created_at'], posts[-1]['id']) if has_more else None
+            }
+            feed_cache.put_page(before, limit, page, version)
+
+        # Which of the page's originals the caller liked, in one indexed lookup
+        liked = set()
+        original_ids = list({original_id(post) for post in page['posts']})
+        if user_id and original_ids:
+            placeholders = ', '.join('?' * len(original_ids))
+            liked = {row['post_id'] for row in cursor.execute(
+                FEED_LIKED_SQL.format(placeholders=placeholders),
+                (user_id, *original_ids)
+            )}
+
+    response = jsonify({
+        'success': True,
+        'posts': [dict(post, liked=original_id(post) in liked) for post in page['posts']],
+        'has_more': page['has_more'],
+        'next_before': page['next_before']
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/api/feed/cache-stats', methods=['GET'])
+def feed_cache_stats():
+    """Report feed cache hits, misses and invalidations"""
+    return jsonify(feed_cache.stats())
 
 
 @app.route("/posts", methods=["POST"])
@@ -731,16 +1375,16 @@ def create_post():
         return jsonify({'success': False, 'message': 'Missing fields'}), 400
 
     #insert new post
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    cursor.execute("""
-        INSERT INTO posts (author, title, content)
-        VALUES (?, ?, ?)
-    """, (session['username'], title, content))
+        cursor.execute("""
+            INSERT INTO posts (author, title, content)
+            VALUES (?, ?, ?)
+        """, (session['username'], title, content))
 
-    conn.commit()
-    conn.close()
+        conn.commit()
+    feed_cache.invalidate_newest()
 
     return jsonify({'success': True})
 
@@ -755,36 +1399,35 @@ def repost():
     data = request.get_json()
     post_id = data.get("post_id")
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    #get original post
-    original = cursor.execute(
-        "SELECT * FROM posts WHERE id = ?",
-        (post_id,)
-    ).fetchone()
+        #get original post
+        original = cursor.execute(
+            "SELECT * FROM posts WHERE id = ?",
+            (post_id,)
+        ).fetchone()
 
-    if not original:
-        conn.close()
-        return jsonify({'success': False, 'message': 'Post not found'}), 404
+        if not original:
+            return jsonify({'success': False, 'message': 'Post not found'}), 404
 
-    #create repost with reference to original
-    cursor.execute("""
-        INSERT INTO posts (
-            author, title, content,
-            reposted_from, reposted_by
-        )
-        VALUES (?, ?, ?, ?, ?)
-    """, (
-        original['author'],
-        original['title'],
-        original['content'],
-        original['id'],
-        session['username']
-    ))
-
-    conn.commit()
-    conn.close()
+        #create repost with reference to original
+        cursor.execute("""
+            INSERT INTO posts (
+                author, title, content,
+                reposted_from, reposted_by
+            )
+            VALUES (?, ?, ?, ?, ?)
+        """, (
+            original['author'],
+            original['title'],
+            original['content'],
+            original['id'],
+            session['username']
+        ))
+
+        conn.commit()
+    feed_cache.invalidate_newest()
 
     return jsonify({'success': True})
 
@@ -804,36 +1447,34 @@ def like_post():
     if not post_id:
         return jsonify({'success': False, 'message': 'Post ID required'}), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    # Get original post ID (follow repost chain)
-    post = cursor.execute('SELECT reposted_from FROM posts WHERE id = ?', (post_id,)).fetchone()
-    if not post:
-        conn.close()
-        return jsonify({'success': False, 'message': 'Post not found'}), 404
+        # Get original post ID (follow repost chain)
+        post = cursor.execute('SELECT id, reposted_from FROM posts WHERE id = ?', (post_id,)).fetchone()
+        if not post:
+            return jsonify({'success': False, 'message': 'Post not found'}), 404
 
-    original_post_id = post['reposted_from'] or post_id
+        original_post_id = post['reposted_from'] or post['id']
 
-    # Check if user already liked
-    existing = cursor.execute(
-        'SELECT * FROM post_likes WHERE user_id = ? AND post_id = ?',
-        (user_id, original_post_id)
-    ).fetchone()
+        # Toggle in one write transaction: the INSERT takes the write lock, so a
+        # concurrent click waits and then sees this like instead of racing it
+        liked = cursor.execute(LIKE_INSERT_SQL, (user_id, original_post_id)).rowcount == 1
+        if not liked:
+            # Already liked, so unlike
+            cursor.execute(LIKE_DELETE_SQL, (user_id, original_post_id))
 
-    if existing:
-        # Unlike
-        cursor.execute('DELETE FROM post_likes WHERE id = ?', (existing['id'],))
-        conn.commit()
-        conn.close()
-        return jsonify({'success': True, 'action': 'unliked'})
-    else:
-        # Like
-        cursor.execute('INSERT INTO post_likes (user_id, post_id) VALUES (?, ?)',
-                       (user_id, original_post_id))
-        conn.commit()
-        conn.close()
-        return jsonify({'success': True, 'action': 'liked'})
+        # Keep the stored total in step with the row just added or removed
+        cursor.execute(LIKE_COUNT_UPDATE_SQL, (1 if liked else -1, original_post_id))
+        count = cursor.execute(LIKE_COUNT_SQL, (original_post_id,)).fetchone()['like_count']
+        feed_cache.commit_like(conn, original_post_id, count)
+
+    return jsonify({
+        'success': True,
+        'action': 'liked' if liked else 'unliked',
+        'count': count,
+        'liked': liked
+    })
 
 
 @app.route('/post-likes/<int:post_id>', methods=['GET'])
@@ -845,37 +1486,34 @@ def get_post_likes(post_id):
     else:
         user_id = session['user_id']
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Get original post ID (follow repost chain)
-    post = cursor.execute('SELECT reposted_from FROM posts WHERE id = ?', (post_id,)).fetchone()
-    if not post:
-        conn.close()
-        return jsonify({'success': False, 'message': 'Post not found'}), 404
+    with db_connection() as conn:
+        cursor = conn.cursor()
 
-    original_post_id = post['reposted_from'] or post_id
+        # Get original post ID (follow repost chain) and its stored like count
+        post = cursor.execute(POST_LIKE_COUNT_SQL, (post_id,)).fetchone()
+        if not post:
+            return jsonify({'success': False, 'message': 'Post not found'}), 404
 
-    # Get like count
-    count = cursor.execute(
-        'SELECT COUNT(*) as cnt FROM post_likes WHERE post_id = ?',
-        (original_post_id,)
-    ).fetchone()['cnt']
+        original_post_id = post['original_id']
+        count = post['like_count']
 
-    # Check if current user liked
-    liked = False
-    if user_id:
-        liked = cursor.execute(
-            'SELECT 1 FROM post_likes WHERE post_id = ? AND user_id = ?',
-            (original_post_id, user_id)
-        ).fetchone() is not None
+        # Check if current user liked
+        liked = False
+        if user_id:
+            liked = cursor.execute(POST_LIKED_SQL, (original_post_id, user_id)).fetchone() is not None
 
-    conn.close()
     return jsonify({'success': True, 'count': count, 'liked': liked})
 
 
 # ========== LANGUAGE EXCHANGE ENDPOINTS ==========
 
+#page sizes for exchange partner suggestions
+EXCHANGE_PAGE_SIZE = 20
+MAX_EXCHANGE_PAGE_SIZE = 100
+
+#language -> users index over published exchange requests
+exchange_matcher = ExchangeMatcher()
+
 @app.route('/publish-exchange-request', methods=['POST'])
 def publish_exchange_request():
     """Publish a language exchange request"""
@@ -889,60 +1527,105 @@ def publish_exchange_request():
     learning = data.get('learning', [])
     
     #validate input
+    if not isinstance(speaks, list) or not isinstance(learning, list):
+        return jsonify({'success': False, 'message': 'Languages must be lists'}), 400
+    speaks = sorted(parse_languages(','.join(str(lang) for lang in speaks)))
+    learning = sorted(parse_languages(','.join(str(lang) for lang in learning)))
     if not speaks or not learning:
         return jsonify({'success': False, 'message': 'Must specify languages'}), 400
     
     user_id = session['user_id']
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    # Delete any existing request from this user
-    cursor.execute('DELETE FROM exchange_requests WHERE user_id = ?', (user_id,))
+        # Delete any existing request from this user
+        cursor.execute('DELETE FROM exchange_requests WHERE user_id = ?', (user_id,))
     
-    # Create new request
-    cursor.execute('''
-        INSERT INTO exchange_requests (user_id, speaks_languages, learning_languages)
-        VALUES (?, ?, ?)
-    ''', (user_id, ','.join(speaks), ','.join(learning)))
+        # Create new request
+        cursor.execute('''
+            INSERT INTO exchange_requests (user_id, speaks_languages, learning_languages)
+            VALUES (?, ?, ?)
+        ''', (user_id, ','.join(speaks), ','.join(learning)))
+        request_id = cursor.lastrowid
     
-    conn.commit()
-    conn.close()
+        conn.commit()
+    exchange_matcher.update(user_id, request_id, speaks, learning)
+    
+    #tell open exchange boards to refresh
+    chat_hub.publish(EXCHANGE_REQUESTS_CHANNEL, 'exchange_requests', {'user_id': user_id})
     
     return jsonify({'success': True, 'message': 'Request published'})
 
 @app.route('/get-exchange-requests', methods=['GET'])
 def get_exchange_requests():
-    """Get all exchange requests except from current user"""
+    """Get a page of exchange partners for the current user.
+
+    With a published request of their own, users get candidates ranked by
+    reciprocal fit from exchange_matcher. Without one, they can only browse
+    other requests, newest first.
+    """
     #check authentication
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'}), 401
-    
+
     user_id = session['user_id']
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Fetch all exchange requests except from the current user
-    requests = cursor.execute('''
-        SELECT e.user_id, e.speaks_languages, e.learning_languages, 
-               u.username, u.fullname
-        FROM exchange_requests e
-        JOIN users u ON e.user_id = u.id
-        WHERE e.user_id != ?
-        ORDER BY e.created_at DESC
-    ''', (user_id,)).fetchall()
-    
-    conn.close()
-    
-    #format requests list
-    requests_list = [{
-        'user_id': r['user_id'],
-        'username': r['username'],
-        'fullname': r['fullname'],
-        'speaks': r['speaks_languages'].split(','),
-        'learning': r['learning_languages'].split(',')
-    } for r in requests]
-    
-    return jsonify({'success': True, 'requests': requests_list})
+    try:
+        after = request.args.get('after')
+        limit = min(int(request.args.get('limit', EXCHANGE_PAGE_SIZE)), MAX_EXCHANGE_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        cursor_mode, after = decode_match_cursor(after) if after else (None, None)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid paging parameters'}), 400
+
+    with db_connection() as conn:
+        exchange_matcher.ensure_loaded(conn)
+
+        mode = MATCH_MODE if exchange_matcher.request_for(user_id) is not None else BROWSE_MODE
+        #a cursor from the other list (e.g. from before the user published a request)
+        #points into a different ordering, so don't resume from it
+        if cursor_mode is not None and cursor_mode != mode:
+            return jsonify({'success': False, 'message': 'Cursor is from a different list, reload from the first page'}), 400
+
+        if mode == MATCH_MODE:
+            requests_list, has_more = exchange_matcher.match(user_id, after, limit)
+        else:
+            # Nothing to match against yet: newest requests first
+            rows = conn.execute(EXCHANGE_BROWSE_SQL, (user_id, -after[2] if after else sys.maxsize, limit + 1)).fetchall()
+            has_more = len(rows) > limit
+            requests_list = [{
+                'user_id': r['user_id'],
+                'speaks': sorted(parse_languages(r['speaks_languages'])),
+                'learning': sorted(parse_languages(r['learning_languages'])),
+                'teaches': [],
+                'wants': [],
+                'reciprocal': False,
+                'cursor': encode_match_cursor((0, 0, -r['id']), BROWSE_MODE)
+            } for r in rows[:limit]]
+
+        # Fill in names for just this page
+        if requests_list:
+            ids = [r['user_id'] for r in requests_list]
+            placeholders = ', '.join('?' * len(ids))
+            users = {row['id']: row for row in conn.execute(
+                f'SELECT id, username, fullname FROM users WHERE id IN ({placeholders})', ids
+            )}
+            for r in requests_list:
+                r['username'] = users[r['user_id']]['username']
+                r['fullname'] = users[r['user_id']]['fullname']
+
+    return jsonify({
+        'success': True,
+        'requests': requests_list,
+        'has_more': has_more,
+        #pass back as ?after= to load the next page
+        'next_after': requests_list[-1]['cursor'] if has_more else None
+    })
+
+@app.route('/api/exchange/matcher-stats', methods=['GET'])
+def exchange_matcher_stats():
+    """Report the size of the matching index and how much work matches did"""
+    return jsonify(exchange_matcher.stats())
 
 @app.route('/connect-exchange', methods=['POST'])
 def connect_exchange():
@@ -961,61 +1644,33 @@ def connect_exchange():
     user_id = session['user_id']
     
     # Check if connection already exists
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    existing = cursor.execute('''
-        SELECT * FROM exchange_connections 
-        WHERE (user1_id = ? AND user2_id = ?) OR (user1_id = ? AND user2_id = ?)
-    ''', (user_id, partner_id, partner_id, user_id)).fetchone()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    if not existing:
-        # Create new connection
-        cursor.execute('''
-            INSERT INTO exchange_connections (user1_id, user2_id)
-            VALUES (?, ?)
-        ''', (user_id, partner_id))
-        conn.commit()
+        existing = cursor.execute('''
+            SELECT * FROM exchange_connections 
+            WHERE (user1_id = ? AND user2_id = ?) OR (user1_id = ? AND user2_id = ?)
+        ''', (user_id, partner_id, partner_id, user_id)).fetchone()
+    
+        if not existing:
+            # Create new connection
+            cursor.execute('''
+                INSERT INTO exchange_connections (user1_id, user2_id)
+                VALUES (?, ?)
+            ''', (user_id, partner_id))
+            conn.commit()
     
-    conn.close()
     
     return jsonify({'success': True, 'message': 'Connected successfully'})
 
 @app.route('/get-exchange-messages/<int:partner_id>', methods=['GET'])
 def get_exchange_messages(partner_id):
-    """Get exchange messages with a partner"""
+    """Get exchange messages with a partner (see conversation_response)"""
     #check authentication
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'}), 401
     
-    user_id = session['user_id']
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Get all messages between these two users
-    messages = cursor.execute('''
-        SELECT m.id, m.sender_id, m.receiver_id, m.message_text, m.timestamp,
-               u.username as sender_username
-        FROM messages m
-        JOIN users u ON m.sender_id = u.id
-        WHERE (m.sender_id = ? AND m.receiver_id = ?) 
-           OR (m.sender_id = ? AND m.receiver_id = ?)
-        ORDER BY m.timestamp ASC
-    ''', (user_id, partner_id, partner_id, user_id)).fetchall()
-    
-    conn.close()
-    
-    #format messages list
-    messages_list = [{
-        'id': m['id'],
-        'sender_id': m['sender_id'],
-        'message_text': m['message_text'],
-        'timestamp': m['timestamp'],
-        'sender_username': m['sender_username'],
-        'is_mine': m['sender_id'] == user_id
-    } for m in messages]
-    
-    return jsonify({'success': True, 'messages': messages_list})
+    return conversation_response(session['user_id'], partner_id)
 
 @app.route('/send-exchange-message', methods=['POST'])
 def send_exchange_message():
@@ -1032,24 +1687,31 @@ def send_exchange_message():
     #validate input
     if not partner_id or not message_text:
         return jsonify({'success': False, 'message': 'Missing required fields'}), 400
+    try:
+        partner_id = int(partner_id)
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid partner ID'}), 400
     
     sender_id = session['user_id']
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    with db_connection() as conn:
+        cursor = conn.cursor()
     
-    # Insert message
-    cursor.execute('''
-        INSERT INTO messages (sender_id, receiver_id, message_text)
-        VALUES (?, ?, ?)
-    ''', (sender_id, partner_id, message_text))
+        # Insert message
+        cursor.execute('''
+            INSERT INTO messages (sender_id, receiver_id, message_text)
+            VALUES (?, ?, ?)
+        ''', (sender_id, partner_id, message_text))
+        message_id = cursor.lastrowid
+        count_unread(conn, partner_id, sender_id)
+    
+        conn.commit()
+        timestamp = cursor.execute(MESSAGE_TIMESTAMP_SQL, (message_id,)).fetchone()['timestamp']
     
-    conn.commit()
-    message_id = cursor.lastrowid
-    timestamp = cursor.execute('SELECT timestamp FROM messages WHERE id = ?', (message_id,)).fetchone()['timestamp']
-    conn.close()
+    publish_message(message_id, sender_id, partner_id, message_text, timestamp)
     
     return jsonify({'success': True, 'message_id': message_id, 'timestamp': timestamp})
 
 #Run the Flask application
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    #request handlers share no mutable language state, so serve them on many threads
+    app.run(debug=True, port=5000, threaded=True)
\ No newline at end of file
@@ -0,0 +1,185 @@
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+from contextlib import asynccontextmanager
+from googletrans import Translator
+
+#translations a batch runs at once
+BATCH_CONCURRENCY = 8
+
+class BackgroundLoop:
+    """Long-lived asyncio event loop running in a daemon thread.
+
+    Flask handlers submit coroutines here instead of calling asyncio.run(),
+    so HTTP clients created on the loop can keep their connections warm.
+    """
+
+    def __init__(self, name='async-loop'):
+        self.loop = asyncio.new_event_loop()
+        self._shutdown_hooks = []
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro, context=None):
+        """Schedule a coroutine on the loop and return a concurrent Future"""
+        if self._closed:
+            coro.close()
+            raise RuntimeError('Background loop has been shut down')
+
+        future = concurrent.futures.Future()
+
+        def on_done(task):
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+
+        def start():
+            #run inside the caller's context so Flask's request/app globals resolve
+            task = self.loop.create_task(coro, context=context)
+            task.add_done_callback(on_done)
+
+        self.loop.call_soon_threadsafe(start)
+        return future
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop from a worker thread and wait for the result"""
+        return self.submit(coro, context=contextvars.copy_context()).result(timeout)
+
+    def add_shutdown_hook(self, hook):
+        """Register an async callable to run on the loop before it stops"""
+        self._shutdown_hooks.append(hook)
+
+    def shutdown(self, timeout=5):
+        """Run shutdown hooks, cancel leftover tasks and stop the loop"""
+        if self._closed:
+            return
+        self._closed = True
+
+        async def finish():
+            for hook in self._shutdown_hooks:
+                try:
+                    await hook()
+                except Exception as e:
+                    print(f"Shutdown hook failed: {e}")
+
+            #cancel anything still running
+            current = asyncio.current_task()
+            pending = [t for t in asyncio.all_tasks() if t is not current]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(finish(), self.loop).result(timeout)
+        except Exception as e:
+            print(f"Background loop shutdown error: {e}")
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        if not self.loop.is_running():
+            self.loop.close()
+
+class TranslatorLease:
+    """A Translator checked out of a TranslatorPool"""
+
+    def __init__(self, pool, translator):
+        self.pool = pool
+        self.translator = translator
+
+    async def refresh(self):
+        """Swap a misbehaving client for a fresh one"""
+        await self.pool._close(self.translator)
+        self.translator = self.pool._new_translator()
+        return self.translator
+
+class TranslatorPool:
+    """Fixed-size pool of googletrans clients that live on one event loop"""
+
+    def __init__(self, size=4):
+        self.size = size
+        self._queue = None
+        self._all = []
+
+    def _new_translator(self):
+        translator = Translator()
+        self._all.append(translator)
+        return translator
+
+    async def _close(self, translator):
+        if translator in self._all:
+            self._all.remove(translator)
+        #googletrans keeps its httpx.AsyncClient on .client
+        client = getattr(translator, 'client', None)
+        if client is not None and hasattr(client, 'aclose'):
+            await client.aclose()
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Check out a translator, returning it to the pool afterwards"""
+        #the queue is created lazily so it binds to the running loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            for _ in range(self.size):
+                self._queue.put_nowait(self._new_translator())
+
+        lease = TranslatorLease(self, await self._queue.get())
+        try:
+            yield lease
+        finally:
+            self._queue.put_nowait(lease.translator)
+
+    async def close(self):
+        """Close every client's HTTP connections"""
+        for translator in list(self._all):
+            try:
+                await self._close(translator)
+            except Exception as e:
+                print(f"Failed to close translator client: {e}")
+        self._queue = None
+
+def translation_error_response(error_msg):
+    """Map a translation failure to a JSON error and status code"""
+    #Handle JSON decode errors
+    if "JSONDecodeError" in error_msg or "Expecting value" in error_msg:
+        return {'error': 'Translation service temporarily unavailable. Please try again.'}, 503
+    return {'error': f'Translation failed: {error_msg}'}, 500
+
+async def translate_batch(translate, items, concurrency=BATCH_CONCURRENCY):
+    """Translate (text, target_language) pairs concurrently, deduping repeats.
+
+    ``translate`` is a coroutine function called as ``translate(text, dest=lang)``.
+    Returns one result dict per input item, in input order.
+    """
+    #dedupe identical requests so each unique pair is translated once
+    unique = {}
+    for text, target_lang in items:
+        key = (' '.join(text.split()), target_lang)
+        unique.setdefault(key, (text, target_lang))
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def translate_one(text, target_lang):
+        async with semaphore:
+            try:
+                translated_text = await translate(text, dest=target_lang)
+                return {'status': 'ok', 'translated_text': translated_text}
+            except Exception as e:
+                error_msg = str(e)
+                print(f"Translation error: {error_msg}")
+                error, status = translation_error_response(error_msg)
+                return {'status': 'error', 'error': error['error'], 'code': status}
+
+    keys = list(unique)
+    outcomes = await asyncio.gather(*(translate_one(*unique[key]) for key in keys))
+    results_by_key = dict(zip(keys, outcomes))
+
+    return [results_by_key[(' '.join(text.split()), target_lang)] for text, target_lang in items]
@@ -0,0 +1,147 @@
+import os
+import subprocess
+import tempfile
+import threading
+import numpy as np
+
+#whisper expects 16 kHz mono audio
+SAMPLE_RATE = 16000
+
+FFMPEG_DECODE_ARGS = [
+    'ffmpeg', '-loglevel', 'error',
+    '-i', 'pipe:0',
+    '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE),
+    'pipe:1'
+]
+
+class AudioDecodeError(ValueError):
+    """Raised when an upload is empty or ffmpeg cannot decode it"""
+
+def pcm16_to_float(data):
+    """Convert little-endian 16-bit PCM bytes to a float32 array in [-1, 1]"""
+    usable = len(data) - (len(data) % 2)
+    return np.frombuffer(bytes(data[:usable]), np.int16).astype(np.float32) / 32768.0
+
+def needs_seeking(data):
+    """MP4/M4A/MOV files may keep their index (moov atom) at the end, which a pipe can't reach"""
+    return data[4:8] == b'ftyp'
+
+def _decode_from_file(data):
+    #ffmpeg can seek in a real file, so containers indexed at the end decode too
+    fd, path = tempfile.mkstemp(suffix='.upload')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        args = [path if arg == 'pipe:0' else arg for arg in FFMPEG_DECODE_ARGS]
+        return subprocess.run(args, capture_output=True)
+    finally:
+        os.remove(path)
+
+def decode_audio(source):
+    """Decode an encoded upload (bytes or file object) straight to 16 kHz float32.
+
+    Most uploads are piped through ffmpeg's stdin and the PCM read back from
+    its stdout, so nothing touches the disk. Containers that need seeking, and
+    anything the pipe fails to decode, go through a temporary file instead.
+    """
+    data = source if isinstance(source, (bytes, bytearray)) else source.read()
+    if not data:
+        raise AudioDecodeError('Empty audio upload')
+
+    if needs_seeking(data):
+        process = _decode_from_file(data)
+    else:
+        process = subprocess.run(FFMPEG_DECODE_ARGS, input=data, capture_output=True)
+        if process.returncode != 0 or not process.stdout:
+            process = _decode_from_file(data)
+
+    if process.returncode != 0:
+        raise AudioDecodeError(f"Failed to decode audio: {process.stderr.decode(errors='ignore').strip()}")
+    return pcm16_to_float(process.stdout)
+
+class StreamingDecoder:
+    """Long-running ffmpeg process that turns encoded chunks into 16 kHz PCM.
+
+    Encoded audio (e.g. MediaRecorder webm chunks) is written to ffmpeg's stdin
+    as it arrives; a reader thread collects the decoded samples from stdout.
+    Sample offsets count from the start of the recording, even after older
+    audio has been dropped with ``discard``.
+    """
+
+    def __init__(self):
+        self._process = subprocess.Popen(
+            FFMPEG_DECODE_ARGS,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        self._pcm = bytearray()
+        #absolute offset of the first sample still held in _pcm
+        self._offset = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        while True:
+            data = self._process.stdout.read1(65536)
+            if not data:
+                break
+            with self._cond:
+                self._pcm.extend(data)
+                self._cond.notify_all()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def sample_count(self):
+        with self._cond:
+            return self._offset + len(self._pcm) // 2
+
+    @property
+    def closed(self):
+        """True once ffmpeg has exited and every decoded sample has been read"""
+        with self._cond:
+            return self._closed
+
+    def write(self, data):
+        """Feed another chunk of encoded audio to ffmpeg"""
+        self._process.stdin.write(data)
+        self._process.stdin.flush()
+
+    def wait_for(self, samples, timeout=None):
+        """Block until at least ``samples`` are decoded, ffmpeg exits or the timeout passes"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._closed or self._offset + len(self._pcm) // 2 >= samples, timeout)
+            return self._offset + len(self._pcm) // 2
+
+    def samples(self, start=0, end=None):
+        """Return decoded audio between two sample offsets as float32"""
+        with self._cond:
+            if start < self._offset:
+                raise ValueError(f'Samples before {self._offset} were discarded')
+            end = self._offset + len(self._pcm) // 2 if end is None else end
+            return pcm16_to_float(self._pcm[(start - self._offset) * 2:(end - self._offset) * 2])
+
+    def discard(self, before):
+        """Drop decoded audio before a sample offset that will not be read again"""
+        with self._cond:
+            drop = min(before - self._offset, len(self._pcm) // 2)
+            if drop > 0:
+                del self._pcm[:drop * 2]
+                self._offset += drop
+
+    def close(self, timeout=10):
+        """Signal end of input and wait for ffmpeg to flush the remaining audio"""
+        if not self._process.stdin.closed:
+            try:
+                self._process.stdin.close()
+            except BrokenPipeError:
+                pass
+        self._reader.join(timeout)
+        try:
+            self._process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
@@ -0,0 +1,58 @@
+"""Compare the temp-file upload path with in-memory ffmpeg decoding.
+
+Usage (from the backend directory):
+    python benchmarks/audio_decode.py path/to/recording.webm [iterations]
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from audio import SAMPLE_RATE, decode_audio, pcm16_to_float
+
+def decode_via_temp_file(data):
+    #the old path: save the upload to disk, then let ffmpeg re-read it
+    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp:
+        path = tmp.name
+        tmp.write(data)
+    try:
+        out = subprocess.run(
+            ['ffmpeg', '-nostdin', '-loglevel', 'error', '-i', path,
+             '-f', 's16le', '-ac', '1', '-ar', str(SAMPLE_RATE), 'pipe:1'],
+            capture_output=True, check=True
+        ).stdout
+        return pcm16_to_float(out)
+    finally:
+        os.remove(path)
+
+def measure(label, fn, data, iterations):
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        samples = fn(data)
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"{label:<12} median {statistics.median(timings):8.2f} ms   "
+          f"p95 {sorted(timings)[int(len(timings) * 0.95) - 1]:8.2f} ms   "
+          f"({len(samples) / SAMPLE_RATE:.1f}s of audio)")
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    with open(sys.argv[1], 'rb') as f:
+        data = f.read()
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    #warm the page cache and ffmpeg binary before timing
+    decode_audio(data)
+
+    measure('temp file', decode_via_temp_file, data, iterations)
+    measure('in memory', decode_audio, data, iterations)
+
+if __name__ == '__main__':
+    main()
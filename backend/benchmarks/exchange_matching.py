@@ -0,0 +1,77 @@
+"""Time exchange partner matching against a large set of published requests.
+
+Builds a throwaway database with synthetic exchange requests (language
+popularity is skewed, as it is in practice), loads the matcher from it and
+times the first page and a deeper page of matches for random users.
+
+Usage (from the backend directory):
+    python benchmarks/exchange_matching.py [requests] [queries]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import database
+from exchange_matcher import ExchangeMatcher, decode_match_cursor
+
+LANGUAGES = ['en', 'es', 'fr', 'ar', 'de', 'it', 'pt', 'zh', 'ja', 'ko', 'ru', 'hi', 'tr', 'nl', 'sv', 'pl']
+#earlier languages in the list are picked far more often
+WEIGHTS = [1 / (rank + 1) for rank in range(len(LANGUAGES))]
+
+def pick_languages(rng, count):
+    return sorted(set(rng.choices(LANGUAGES, WEIGHTS, k=count)))
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(42)
+
+    database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'matching.db')
+    database.init_db()
+    with database.db_connection() as conn:
+        conn.executemany(
+            'INSERT INTO exchange_requests (user_id, speaks_languages, learning_languages) VALUES (?, ?, ?)',
+            ((user_id, ','.join(pick_languages(rng, rng.randint(1, 3))), ','.join(pick_languages(rng, rng.randint(1, 2))))
+             for user_id in range(1, total + 1))
+        )
+        conn.commit()
+
+        matcher = ExchangeMatcher()
+        started = time.perf_counter()
+        matcher.ensure_loaded(conn)
+    print(f"indexed {total} requests in {time.perf_counter() - started:.2f}s")
+
+    first_page, deep_page = [], []
+    for _ in range(queries):
+        user_id = rng.randint(1, total)
+        started = time.perf_counter()
+        candidates, has_more = matcher.match(user_id)
+        first_page.append((time.perf_counter() - started) * 1000)
+
+        #walk a few pages in, as a user scrolling the suggestions would
+        after = None
+        for _ in range(5):
+            if not has_more:
+                break
+            _, after = decode_match_cursor(candidates[-1]['cursor'])
+            started = time.perf_counter()
+            candidates, has_more = matcher.match(user_id, after)
+        deep_page.append((time.perf_counter() - started) * 1000)
+
+    stats = matcher.stats()
+    print(f"{stats['profiles']} profiles; {stats['score_cache_hits']}/{stats['matches']} matches reused cached scores")
+    for label, values in (('first page', first_page), ('sixth page', deep_page)):
+        print(f"{label:<12} median {statistics.median(values):7.2f} ms   "
+              f"p95 {percentile(values, 0.95):7.2f} ms   max {max(values):7.2f} ms")
+
+if __name__ == '__main__':
+    main()
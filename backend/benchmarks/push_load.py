@@ -0,0 +1,125 @@
+"""Load test for the /events push channel: many idle streams, then delivery latency.
+
+Creates throwaway accounts on a running server, opens one /events stream per
+receiver, keeps them idle for a while, then sends exchange messages to random
+receivers and times how long each takes to arrive on the receiver's stream.
+
+Usage (with app.py running on port 5000):
+    python benchmarks/push_load.py [connections] [messages] [idle_seconds]
+"""
+import http.client
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+import uuid
+
+HOST, PORT = '127.0.0.1', 5000
+DELIVERY_TIMEOUT = 30
+
+def request(method, path, body=None, cookie=None):
+    conn = http.client.HTTPConnection(HOST, PORT, timeout=30)
+    headers = {'Content-Type': 'application/json'}
+    if cookie:
+        headers['Cookie'] = cookie
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    set_cookie = response.getheader('Set-Cookie')
+    conn.close()
+    return response.status, json.loads(data) if data else None, set_cookie
+
+def create_user(run_id, n):
+    username = f'load_{run_id}_{n}'
+    request('POST', '/signup', {
+        'fullname': f'Load Test {n}',
+        'email': f'{username}@example.com',
+        'username': username,
+        'password': 'load-test-password'
+    })
+    status, data, set_cookie = request('POST', '/login', {'username': username, 'password': 'load-test-password'})
+    if status != 200 or not set_cookie:
+        raise RuntimeError(f'Could not log in {username}: {data}')
+    user_id = request('GET', '/check-session', cookie=set_cookie.split(';')[0])[1]['user_id']
+    return user_id, set_cookie.split(';')[0]
+
+def listen(cookie, arrivals, lock, connected):
+    #hold one /events stream open and record when each message event arrives
+    conn = http.client.HTTPConnection(HOST, PORT)
+    conn.request('GET', '/events', headers={'Cookie': cookie, 'Accept': 'text/event-stream'})
+    response = conn.getresponse()
+    connected.release()
+    event = None
+    while True:
+        line = response.fp.readline()
+        if not line:
+            return
+        line = line.decode().rstrip('\n')
+        if line.startswith('event: '):
+            event = line[7:]
+        elif line.startswith('data: ') and event == 'message':
+            payload = json.loads(line[6:])
+            with lock:
+                arrivals[payload['id']] = (time.time(), payload['published_at'])
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def main():
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    messages = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    idle_seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 20
+    run_id = uuid.uuid4().hex[:8]
+
+    print(f"creating {connections + 1} accounts...")
+    sender_id, sender_cookie = create_user(run_id, 'sender')
+    receivers = [create_user(run_id, n) for n in range(connections)]
+
+    arrivals = {}
+    lock = threading.Lock()
+    connected = threading.Semaphore(0)
+    started = time.time()
+    for _, cookie in receivers:
+        threading.Thread(target=listen, args=(cookie, arrivals, lock, connected), daemon=True).start()
+    for _ in receivers:
+        connected.acquire()
+    print(f"{connections} streams open in {time.time() - started:.2f}s")
+
+    #idle streams only cost keepalives; check the server still holds them all
+    time.sleep(idle_seconds)
+    stats = request('GET', '/events/stats')[1]
+    print(f"after {idle_seconds:.0f}s idle: server reports {stats['subscribers']} subscribers")
+
+    sent = {}
+    for i in range(messages):
+        receiver_id, _ = random.choice(receivers)
+        sent_at = time.time()
+        status, data, _ = request('POST', '/send-exchange-message', {
+            'partner_id': receiver_id,
+            'message_text': f'load test message {i}'
+        }, cookie=sender_cookie)
+        if status == 200:
+            sent[data['message_id']] = sent_at
+
+    deadline = time.time() + DELIVERY_TIMEOUT
+    while time.time() < deadline:
+        with lock:
+            if all(message_id in arrivals for message_id in sent):
+                break
+        time.sleep(0.05)
+
+    with lock:
+        end_to_end = [(arrivals[m][0] - sent[m]) * 1000 for m in sent if m in arrivals]
+        push_only = [(arrivals[m][0] - arrivals[m][1]) * 1000 for m in sent if m in arrivals]
+
+    print(f"delivered {len(end_to_end)}/{len(sent)} messages")
+    if end_to_end:
+        for label, values in (('send -> receive', end_to_end), ('publish -> receive', push_only)):
+            print(f"{label:<20} median {statistics.median(values):7.2f} ms   "
+                  f"p95 {percentile(values, 0.95):7.2f} ms   max {max(values):7.2f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Measure how long app.py takes to serve its first page and to become ready to transcribe.
+
+Usage (from the backend directory, with port 5000 free):
+    python benchmarks/startup.py [runs]
+
+Set WHISPER_MODEL / WHISPER_WORKERS in the environment to compare configurations.
+"""
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BASE_URL = 'http://127.0.0.1:5000'
+TIMEOUT_SECONDS = 600
+
+def wait_for(url, started):
+    #poll until the URL answers 200, returning seconds since launch
+    while time.time() - started < TIMEOUT_SECONDS:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.time() - started
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{url} not ready after {TIMEOUT_SECONDS}s")
+
+def run_once():
+    started = time.time()
+    process = subprocess.Popen(
+        [sys.executable, 'app.py'],
+        cwd=BACKEND_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+    try:
+        first_page = wait_for(f'{BASE_URL}/login.html', started)
+        ready = wait_for(f'{BASE_URL}/health/ready', started)
+        return first_page, ready
+    finally:
+        #the dev server's reloader forks a child, so stop the whole group
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    pages, readies = [], []
+    for i in range(runs):
+        first_page, ready = run_once()
+        pages.append(first_page)
+        readies.append(ready)
+        print(f"run {i + 1}: first page {first_page:6.2f}s   transcription ready {ready:6.2f}s")
+
+    print(f"median: first page {statistics.median(pages):6.2f}s   "
+          f"transcription ready {statistics.median(readies):6.2f}s")
+
+if __name__ == '__main__':
+    main()
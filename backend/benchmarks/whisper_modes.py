@@ -0,0 +1,109 @@
+"""Compare Whisper inference modes by word error rate and real-time factor.
+
+Each fixture is an audio file with a reference transcript next to it:
+    benchmarks/fixtures/en_cafe.mp3
+    benchmarks/fixtures/en_cafe.txt
+
+Only the transcripts are committed. A transcript with no audio beside it is
+spoken with gTTS on first run, in the language named by its filename
+prefix, and the mp3 is kept for later runs.
+
+Usage (from the backend directory):
+    python benchmarks/whisper_modes.py [fixtures_dir] [model_size] [beam_size] [max_beam_size]
+
+Decoding is greedy, as in the app, unless a beam size is given; a max beam
+size caps it the way WHISPER_MAX_BEAM_SIZE does.
+
+RTF is processing time divided by audio duration; lower is faster, and
+below 1.0 means faster than real time.
+"""
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from audio import SAMPLE_RATE, decode_audio
+from whisper_pool import INFERENCE_MODES, decode_options_for, load_model
+
+DEFAULT_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def normalize_words(text):
+    return re.sub(r"[^\w\s']", ' ', text.lower()).split()
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance between two transcripts"""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            ))
+        previous = current
+    return previous[-1], len(ref)
+
+def render_fixture(stem, reference):
+    """Speak a reference transcript with gTTS; the filename prefix is the language"""
+    from gtts import gTTS
+
+    lang = os.path.basename(stem).split('_')[0]
+    print(f"rendering {os.path.basename(stem)}.mp3 with gTTS ({lang})")
+    gTTS(text=reference, lang=lang).save(stem + '.mp3')
+    return stem + '.mp3'
+
+def load_fixtures(directory):
+    fixtures = []
+    for reference_path in sorted(glob.glob(os.path.join(directory, '*.txt'))):
+        stem = os.path.splitext(reference_path)[0]
+        with open(reference_path, encoding='utf-8') as f:
+            reference = f.read().strip()
+        audio_paths = [p for p in glob.glob(stem + '.*') if not p.endswith('.txt')]
+        if not audio_paths:
+            audio_paths = [render_fixture(stem, reference)]
+        with open(audio_paths[0], 'rb') as f:
+            audio = decode_audio(f.read())
+        fixtures.append((os.path.basename(stem), audio, reference))
+    return fixtures
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_FIXTURES
+    model_size = sys.argv[2] if len(sys.argv) > 2 else 'base'
+    beam_size = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    max_beam_size = int(sys.argv[4]) if len(sys.argv) > 4 else None
+
+    fixtures = load_fixtures(directory)
+    if not fixtures:
+        print(f"No fixtures (audio + .txt reference pairs) found in {directory}")
+        sys.exit(1)
+    total_audio = sum(len(audio) for _, audio, _ in fixtures) / SAMPLE_RATE
+    print(f"{len(fixtures)} fixtures, {total_audio:.1f}s of audio, model '{model_size}', "
+          f"beam {beam_size or 'greedy'}, max beam {max_beam_size or 'uncapped'}\n")
+
+    for mode in INFERENCE_MODES:
+        model = load_model(model_size, mode)
+        options = decode_options_for(mode, beam_size, max_beam_size)
+
+        #one untimed pass so lazy initialization doesn't skew the first fixture
+        model.transcribe(fixtures[0][1], **options)
+
+        errors = words = 0
+        elapsed = 0.0
+        for name, audio, reference in fixtures:
+            start = time.perf_counter()
+            text = model.transcribe(audio, **options)['text']
+            elapsed += time.perf_counter() - start
+            fixture_errors, fixture_words = word_errors(reference, text)
+            errors += fixture_errors
+            words += fixture_words
+
+        wer = errors / words if words else 0.0
+        print(f"{mode:<10} WER {wer:6.2%}   RTF {elapsed / total_audio:6.3f}   ({elapsed:.1f}s total)")
+
+if __name__ == '__main__':
+    main()
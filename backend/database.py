@@ -1,21 +1,88 @@
 import sqlite3
 import hashlib
+import queue
+from contextlib import contextmanager
 from datetime import datetime
 import os
+import sys
 
 # Get the directory where this script is located
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, 'users.db')
 
-def get_db_connection():  
-    conn = sqlite3.connect(DB_PATH)
+# Settings applied to every connection
+PRAGMAS = (
+    # readers no longer block the writer (and vice versa)
+    'PRAGMA journal_mode=WAL',
+    # safe with WAL; only a power loss can drop the last commits
+    'PRAGMA synchronous=NORMAL',
+    # negative means KiB, so about 20 MB of page cache per connection
+    'PRAGMA cache_size=-20000',
+    # read the database file through a 256 MB memory map
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA temp_store=MEMORY',
+    # wait for a competing writer instead of failing with "database is locked"
+    'PRAGMA busy_timeout=5000'
+)
+
+def get_db_connection():
+    """Open a new, configured connection (the caller must close it)"""
+    # connections are handed between request threads by the pool
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
     return conn
 
-def init_db():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+class ConnectionPool:
+    """Reusable SQLite connections, each used by one thread at a time.
+
+    The dev server starts a thread per request, so connections are kept in a
+    shared pool rather than in thread-locals, which would never be reused.
+    """
+
+    def __init__(self, max_idle=16):
+        self._idle = queue.LifoQueue(max_idle)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return get_db_connection()
+
+    def release(self, conn):
+        # never hand the next user a half-finished transaction
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close_all(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+_pool = ConnectionPool()
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection; it goes back to the pool even if the block raises"""
+    conn = _pool.acquire()
+    try:
+        yield conn
+    finally:
+        _pool.release(conn)
+
+def _create_base_schema(cursor):
+    """Migration 1: the original tables (a no-op on databases that already have them)"""
     # Users table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -110,13 +177,416 @@ def init_db():
             FOREIGN KEY (user2_id) REFERENCES users (id)
         )
     ''')
-    
-    conn.commit()
-    conn.close()
-    print("Database initialized!")
+
+    # Translation cache table (persistent tier behind the in-memory LRU)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS translation_cache (
+            source_text TEXT NOT NULL,
+            source_language TEXT NOT NULL,
+            target_language TEXT NOT NULL,
+            translated_text TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (source_text, source_language, target_language)
+        )
+    ''')
+
+def _add_hot_path_indexes(cursor):
+    """Migration 2: indexes for the message, unread, likes and feed queries"""
+    # get_messages: both directions of a conversation, in time order
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_messages_conversation
+        ON messages (sender_id, receiver_id, timestamp)
+    ''')
+    # unread_count and marking a conversation read; covers the COUNT
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_messages_unread
+        ON messages (receiver_id, read_status, sender_id)
+    ''')
+    # get_post_likes: count and "liked by me" without touching the table
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_post_likes_post
+        ON post_likes (post_id, user_id)
+    ''')
+    # get_posts: newest first
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_posts_created_at
+        ON posts (created_at)
+    ''')
+    # get_friends looks friendships up from either side
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_friendships_friend
+        ON friendships (friend_id, status)
+    ''')
+
+def _add_user_search_index(cursor):
+    """Migration 3: trigram full-text index over usernames and full names"""
+    # External-content FTS5 table: it stores only the trigram index, the rows live in users
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_search USING fts5(
+            username, fullname,
+            content='users', content_rowid='id',
+            tokenize='trigram'
+        )
+    ''')
+    # Keep the index in step with users inside the same transaction as the write
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_search_insert AFTER INSERT ON users BEGIN
+            INSERT INTO users_search (rowid, username, fullname)
+            VALUES (new.id, new.username, new.fullname);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_search_delete AFTER DELETE ON users BEGIN
+            INSERT INTO users_search (users_search, rowid, username, fullname)
+            VALUES ('delete', old.id, old.username, old.fullname);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS users_search_update AFTER UPDATE OF username, fullname ON users BEGIN
+            INSERT INTO users_search (users_search, rowid, username, fullname)
+            VALUES ('delete', old.id, old.username, old.fullname);
+            INSERT INTO users_search (rowid, username, fullname)
+            VALUES (new.id, new.username, new.fullname);
+        END
+    ''')
+    # Index the users that already exist
+    cursor.execute("INSERT INTO users_search (users_search) VALUES ('rebuild')")
+    # Queries under three characters are too short for trigrams; they match username prefixes
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_username_nocase
+        ON users (username COLLATE NOCASE)
+    ''')
+
+def _add_unread_counters(cursor):
+    """Migration 4: per-conversation unread counts, kept alongside messages"""
+    # One row per (reader, sender) with unread messages; rows are removed once read
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS unread_counters (
+            user_id INTEGER NOT NULL,
+            sender_id INTEGER NOT NULL,
+            unread INTEGER NOT NULL,
+            PRIMARY KEY (user_id, sender_id)
+        ) WITHOUT ROWID
+    ''')
+    _fill_unread_counters(cursor)
+
+def _fill_unread_counters(cursor):
+    cursor.execute('''
+        INSERT INTO unread_counters (user_id, sender_id, unread)
+        SELECT receiver_id, sender_id, COUNT(*)
+        FROM messages
+        WHERE read_status = 0
+        GROUP BY receiver_id, sender_id
+    ''')
+
+def _add_post_like_counts(cursor):
+    """Migration 5: like totals stored on the post they belong to"""
+    # Likes always point at the original post, so only originals carry a non-zero count
+    cursor.execute('ALTER TABLE posts ADD COLUMN like_count INTEGER NOT NULL DEFAULT 0')
+    _fill_post_like_counts(cursor)
+
+def _fill_post_like_counts(cursor):
+    cursor.execute('''
+        UPDATE posts
+        SET like_count = (SELECT COUNT(*) FROM post_likes WHERE post_likes.post_id = posts.id)
+    ''')
+
+def _add_cache_generations(cursor):
+    """Migration 6: generation counters for the app's in-process caches"""
+    # Offline repairs bump a cache's generation so running servers know to drop it
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cache_generations (
+            name TEXT PRIMARY KEY,
+            generation INTEGER NOT NULL
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO cache_generations (name, generation) VALUES ('feed', 0)")
+
+# Ordered schema migrations; PRAGMA user_version records the last one applied
+MIGRATIONS = [
+    (1, _create_base_schema),
+    (2, _add_hot_path_indexes),
+    (3, _add_user_search_index),
+    (4, _add_unread_counters),
+    (5, _add_post_like_counts),
+    (6, _add_cache_generations),
+]
+
+def migrate(conn):
+    """Bring a database up to the latest schema version, one migration at a time"""
+    current = conn.execute('PRAGMA user_version').fetchone()[0]
+    for version, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        # Each migration and its version bump commit together or not at all
+        conn.execute('BEGIN')
+        try:
+            migration(conn.cursor())
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Applied database migration {version}: {migration.__name__.strip('_')}")
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def rebuild_unread_counters(conn):
+    """Recompute unread_counters from messages; returns how many counters had drifted"""
+    # Hold the write lock so no message is sent or read mid-rebuild
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        drifted = conn.execute('''
+            WITH expected AS (
+                SELECT receiver_id AS user_id, sender_id, COUNT(*) AS unread
+                FROM messages
+                WHERE read_status = 0
+                GROUP BY receiver_id, sender_id
+            ), stored AS (
+                SELECT user_id, sender_id, unread FROM unread_counters
+            )
+            SELECT COUNT(*) FROM (
+                SELECT user_id, sender_id FROM (SELECT * FROM stored EXCEPT SELECT * FROM expected)
+                UNION
+                SELECT user_id, sender_id FROM (SELECT * FROM expected EXCEPT SELECT * FROM stored)
+            )
+        ''').fetchone()[0]
+        conn.execute('DELETE FROM unread_counters')
+        _fill_unread_counters(conn.cursor())
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return drifted
+
+def rebuild_post_like_counts(conn):
+    """Recompute posts.like_count from post_likes; returns how many posts had drifted"""
+    # Hold the write lock so no like is toggled mid-rebuild
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        drifted = conn.execute('''
+            SELECT COUNT(*) FROM posts
+            WHERE like_count != (SELECT COUNT(*) FROM post_likes WHERE post_likes.post_id = posts.id)
+        ''').fetchone()[0]
+        _fill_post_like_counts(conn.cursor())
+        # Running servers cache like counts; a new generation makes them reload
+        conn.execute(FEED_GENERATION_BUMP_SQL)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return drifted
+
+# Hot-path queries, kept here so tests/test_query_plans.py checks the SQL app.py runs
+
+# one direction of a conversation, newest first, read straight off idx_messages_conversation
+CONVERSATION_DIRECTION_SQL = '''
+    SELECT * FROM (
+        SELECT id, sender_id, receiver_id, message_text, timestamp, read_status
+        FROM messages
+        WHERE sender_id = ? AND receiver_id = ? AND (timestamp, id) < (?, ?)
+        ORDER BY timestamp DESC, id DESC
+        LIMIT ?
+    ) direction_page
+'''
+
+# one direction of a conversation after a cursor, oldest first, for delta polling
+CONVERSATION_DELTA_SQL = '''
+    SELECT * FROM (
+        SELECT id, sender_id, receiver_id, message_text, timestamp, read_status
+        FROM messages
+        WHERE sender_id = ? AND receiver_id = ? AND (timestamp, id) > (?, ?)
+        ORDER BY timestamp ASC, id ASC
+        LIMIT ?
+    ) delta_page
+'''
+
+# newest message id in one direction of a conversation
+CONVERSATION_HEAD_SQL = '''
+    SELECT * FROM (
+        SELECT id FROM messages
+        WHERE sender_id = ? AND receiver_id = ?
+        ORDER BY timestamp DESC, id DESC
+        LIMIT 1
+    ) direction_head
+'''
+
+# a page of history: both directions cut at the limit, then merged newest first
+CONVERSATION_PAGE_SQL = f'''
+    SELECT m.*, u.username AS sender_username
+    FROM ({CONVERSATION_DIRECTION_SQL} UNION ALL {CONVERSATION_DIRECTION_SQL}) m
+    JOIN users u ON m.sender_id = u.id
+    ORDER BY m.timestamp DESC, m.id DESC
+    LIMIT ?
+'''
+
+# messages after a cursor in both directions, oldest first
+CONVERSATION_SINCE_SQL = f'''
+    SELECT m.*, u.username AS sender_username
+    FROM ({CONVERSATION_DELTA_SQL} UNION ALL {CONVERSATION_DELTA_SQL}) m
+    JOIN users u ON m.sender_id = u.id
+    ORDER BY m.timestamp ASC, m.id ASC
+    LIMIT ?
+'''
+
+# newest message id plus what each side has left unread, read off idx_messages_unread
+CONVERSATION_VERSION_SQL = f'''
+    SELECT
+        (SELECT MAX(id) FROM ({CONVERSATION_HEAD_SQL} UNION ALL {CONVERSATION_HEAD_SQL})) AS newest,
+        (SELECT COUNT(*) FROM messages WHERE receiver_id = ? AND read_status = 0 AND sender_id = ?) AS unread_in,
+        (SELECT COUNT(*) FROM messages WHERE receiver_id = ? AND read_status = 0 AND sender_id = ?) AS unread_out
+'''
+
+MESSAGE_TIMESTAMP_SQL = 'SELECT timestamp FROM messages WHERE id = ?'
+
+# bump the receiver's unread counter when a message is stored
+COUNT_UNREAD_SQL = '''
+    INSERT INTO unread_counters (user_id, sender_id, unread) VALUES (?, ?, 1)
+    ON CONFLICT (user_id, sender_id) DO UPDATE SET unread = unread + 1
+'''
+
+HAS_UNREAD_SQL = 'SELECT 1 FROM unread_counters WHERE user_id = ? AND sender_id = ?'
+
+MARK_READ_SQL = '''
+    UPDATE messages 
+    SET read_status = 1 
+    WHERE receiver_id = ? AND sender_id = ? AND read_status = 0
+'''
+
+CLEAR_UNREAD_SQL = 'DELETE FROM unread_counters WHERE user_id = ? AND sender_id = ?'
+
+UNREAD_COUNTERS_SQL = 'SELECT sender_id, unread FROM unread_counters WHERE user_id = ?'
+
+# accepted friends in either direction, with their unread counters
+FRIENDS_SQL = '''
+    SELECT DISTINCT u.id, u.username, u.fullname, COALESCE(c.unread, 0) AS unread_count
+    FROM users u
+    LEFT JOIN unread_counters c ON c.user_id = ? AND c.sender_id = u.id
+    WHERE u.id IN (
+        SELECT CASE 
+            WHEN f.user_id = ? THEN f.friend_id
+            WHEN f.friend_id = ? THEN f.user_id
+        END as friend_user_id
+        FROM friendships f
+        WHERE (f.user_id = ? OR f.friend_id = ?)
+        AND f.status = 'accepted'
+    )
+    AND u.id != ?
+    ORDER BY u.username
+'''
+
+# user search pages; each one reads an index, never the whole table
+SEARCH_FIRST_USERS_SQL = '''
+    SELECT id, username, fullname FROM users
+    WHERE id != ?
+    ORDER BY username
+    LIMIT ?
+'''
+
+SEARCH_USERNAME_PREFIX_SQL = '''
+    SELECT id, username, fullname FROM users
+    WHERE username LIKE ? ESCAPE '\\' AND id != ?
+    ORDER BY username COLLATE NOCASE
+    LIMIT ?
+'''
+
+SEARCH_USERS_TRIGRAM_SQL = '''
+    SELECT u.id, u.username, u.fullname
+    FROM users_search
+    JOIN users u ON u.id = users_search.rowid
+    WHERE users_search MATCH ? AND u.id != ?
+    LIMIT ?
+'''
+
+# friendship status for a page of search results; {page_sql} is one of the searches above
+SEARCH_WITH_FRIENDSHIP_SQL = '''
+    SELECT search_page.id, search_page.username, search_page.fullname,
+           f_out.status AS status_out, f_in.status AS status_in
+    FROM ({page_sql}) search_page
+    LEFT JOIN friendships f_out ON f_out.user_id = ? AND f_out.friend_id = search_page.id
+    LEFT JOIN friendships f_in ON f_in.user_id = search_page.id AND f_in.friend_id = ?
+'''
+
+# a page of the feed with original post details for reposts; like counts live on the original
+FEED_PAGE_SQL = '''
+    WITH feed_page AS (
+        SELECT * FROM posts
+        WHERE (created_at, id) < (?, ?)
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    )
+    SELECT 
+        feed_page.id,
+        feed_page.author,
+        feed_page.title,
+        feed_page.content,
+        feed_page.created_at,
+        feed_page.reposted_from,
+        feed_page.reposted_by,
+        orig.title AS original_title,
+        orig.content AS original_content,
+        orig.author AS original_author,
+        COALESCE(orig.like_count, feed_page.like_count) AS like_count
+    FROM feed_page
+    LEFT JOIN posts orig ON feed_page.reposted_from = orig.id
+    ORDER BY feed_page.created_at DESC, feed_page.id DESC
+'''
+
+# checked on every feed request; --rebuild-likes bumps it so cached pages are dropped
+FEED_GENERATION_SQL = "SELECT generation FROM cache_generations WHERE name = 'feed'"
+FEED_GENERATION_BUMP_SQL = "UPDATE cache_generations SET generation = generation + 1 WHERE name = 'feed'"
+
+# which of a page's posts the caller liked; {placeholders} is one ? per post id
+FEED_LIKED_SQL = 'SELECT post_id FROM post_likes WHERE user_id = ? AND post_id IN ({placeholders})'
+
+# like toggle: the INSERT takes the write lock, and only changes a row if not yet liked
+LIKE_INSERT_SQL = 'INSERT INTO post_likes (user_id, post_id) VALUES (?, ?) ON CONFLICT (user_id, post_id) DO NOTHING'
+LIKE_DELETE_SQL = 'DELETE FROM post_likes WHERE user_id = ? AND post_id = ?'
+LIKE_COUNT_UPDATE_SQL = 'UPDATE posts SET like_count = like_count + ? WHERE id = ?'
+LIKE_COUNT_SQL = 'SELECT like_count FROM posts WHERE id = ?'
+
+# the original post (following a repost) and its stored like count
+POST_LIKE_COUNT_SQL = '''
+    SELECT COALESCE(orig.id, p.id) AS original_id, COALESCE(orig.like_count, p.like_count) AS like_count
+    FROM posts p
+    LEFT JOIN posts orig ON p.reposted_from = orig.id
+    WHERE p.id = ?
+'''
+
+POST_LIKED_SQL = 'SELECT 1 FROM post_likes WHERE post_id = ? AND user_id = ?'
+
+# exchange requests newest first, for users without a request of their own to match on
+EXCHANGE_BROWSE_SQL = '''
+    SELECT id, user_id, speaks_languages, learning_languages
+    FROM exchange_requests
+    WHERE user_id != ? AND id < ?
+    ORDER BY id DESC
+    LIMIT ?
+'''
+
+def init_db():
+    conn = get_db_connection()
+    try:
+        version = migrate(conn)
+    finally:
+        conn.close()
+    print(f"Database initialized (schema version {version})!")
 
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
+    # python database.py --rebuild-unread: check and repair the unread counters
+    if '--rebuild-unread' in sys.argv:
+        conn = get_db_connection()
+        try:
+            print(f"Rebuilt unread counters ({rebuild_unread_counters(conn)} had drifted)")
+        finally:
+            conn.close()
+    # python database.py --rebuild-likes: check and repair the post like counts
+    if '--rebuild-likes' in sys.argv:
+        conn = get_db_connection()
+        try:
+            print(f"Rebuilt post like counts ({rebuild_post_like_counts(conn)} had drifted)")
+        finally:
+            conn.close()
\ No newline at end of file
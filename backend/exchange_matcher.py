@@ -0,0 +1,230 @@
+import bisect
+import heapq
+import threading
+
+#match tiers: both sides can teach each other, or only one side can
+RECIPROCAL = 2
+ONE_SIDED = 1
+#requesting profiles whose scored candidate groups are kept between matches
+MAX_SCORED_PROFILES = 1000
+#cursor prefixes: ranked matches, or newest-first browsing for users without a request
+MATCH_MODE = 'm'
+BROWSE_MODE = 'b'
+
+def parse_languages(text):
+    """Split a stored comma-joined language list"""
+    return frozenset(lang.strip() for lang in text.split(',') if lang.strip())
+
+def encode_match_cursor(key, mode=MATCH_MODE):
+    tier, fit, request_id = key
+    return f"{mode}|{-tier}|{-fit}|{-request_id}"
+
+def decode_match_cursor(value):
+    """Parse a cursor from encode_match_cursor into (mode, key); raises ValueError if malformed"""
+    mode, *parts = value.split('|')
+    if mode not in (MATCH_MODE, BROWSE_MODE) or len(parts) != 3:
+        raise ValueError('Invalid cursor')
+    tier, fit, request_id = (int(part) for part in parts)
+    return mode, (-tier, -fit, -request_id)
+
+def _newest_first(members, end, profile):
+    #members[:end] from the highest request id down, tagged with their profile
+    for i in range(end - 1, -1, -1):
+        yield members[i] + (profile,)
+
+class ExchangeMatcher:
+    """In-memory matching over published language exchange requests.
+
+    Requests with the same languages share a profile. Two inverted indexes map
+    each language to the profiles that speak it and the profiles learning it,
+    and every profile keeps its users ordered by request id. Finding partners
+    only scores the profiles listed under the request's own languages, which
+    stays small however many users publish requests.
+
+    Candidates are ranked by tier (reciprocal before one-sided), then by how
+    many languages overlap, then newest request first. The indexes are built
+    from exchange_requests on first use and kept current by ``update`` whenever
+    a request is published.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        #updates published while the first load was reading the table
+        self._pending = []
+        self._requests = {}
+        self._profiles = {}
+        self._speakers = {}
+        self._learners = {}
+        #requesting profile -> its candidate profiles grouped by score, best first;
+        #only a profile appearing or disappearing changes these
+        self._scored = {}
+        self._stats = {'matches': 0, 'updates': 0, 'profiles_scored': 0, 'score_cache_hits': 0}
+
+    def ensure_loaded(self, conn):
+        """Build the indexes from the database the first time they're needed"""
+        if self._loaded:
+            return
+        rows = conn.execute('''
+            SELECT id, user_id, speaks_languages, learning_languages
+            FROM exchange_requests
+            ORDER BY id
+        ''').fetchall()
+        with self._lock:
+            if self._loaded:
+                return
+            for row in rows:
+                self._add(row['user_id'], row['id'],
+                          parse_languages(row['speaks_languages']),
+                          parse_languages(row['learning_languages']))
+            for update in self._pending:
+                self._apply(*update)
+            self._pending = []
+            self._loaded = True
+        print(f"Exchange matcher indexed {len(rows)} requests in {len(self._profiles)} profiles")
+
+    def _add(self, user_id, request_id, speaks, learning):
+        #caller must hold the lock
+        profile = (speaks, learning)
+        self._requests[user_id] = (request_id, profile)
+        members = self._profiles.get(profile)
+        if members is None:
+            members = self._profiles[profile] = []
+            self._scored.clear()
+            for lang in speaks:
+                self._speakers.setdefault(lang, set()).add(profile)
+            for lang in learning:
+                self._learners.setdefault(lang, set()).add(profile)
+        #new requests have the highest id, so this is normally an append
+        bisect.insort(members, (request_id, user_id))
+
+    def _remove(self, user_id):
+        #caller must hold the lock
+        request_id, profile = self._requests.pop(user_id)
+        members = self._profiles[profile]
+        del members[bisect.bisect_left(members, (request_id, user_id))]
+        if members:
+            return
+        del self._profiles[profile]
+        self._scored.clear()
+        speaks, learning = profile
+        for index, langs in ((self._speakers, speaks), (self._learners, learning)):
+            for lang in langs:
+                index[lang].discard(profile)
+                if not index[lang]:
+                    del index[lang]
+
+    def update(self, user_id, request_id, speaks, learning):
+        """Replace a user's request after it was published; older request ids are ignored"""
+        update = (user_id, request_id, frozenset(speaks), frozenset(learning))
+        with self._lock:
+            if self._loaded:
+                self._apply(*update)
+            else:
+                #the load may have read the table before this request was committed
+                self._pending.append(update)
+
+    def _apply(self, user_id, request_id, speaks, learning):
+        #caller must hold the lock
+        current = self._requests.get(user_id)
+        if current is not None:
+            if current[0] >= request_id:
+                return
+            self._remove(user_id)
+        self._add(user_id, request_id, speaks, learning)
+        self._stats['updates'] += 1
+
+    def request_for(self, user_id):
+        """Return (speaks, learning) for a user's published request, or None"""
+        with self._lock:
+            current = self._requests.get(user_id)
+        return None if current is None else current[1]
+
+    def match(self, user_id, after=None, limit=20):
+        """Return (candidates, has_more) for a user with a published request.
+
+        Each candidate is a dict with the other user's languages, what they
+        can teach this user and what they want to learn from them. ``after``
+        is the key decode_match_cursor returns for a previous page's last
+        candidate.
+        """
+        with self._lock:
+            _, (speaks, learning) = self._requests[user_id]
+
+            groups = self._scored.get((speaks, learning))
+            if groups is None:
+                groups = self._score_profiles(speaks, learning)
+            else:
+                self._stats['score_cache_hits'] += 1
+
+            page = []
+            for score, profiles in groups:
+                if after is not None and score < after[:2]:
+                    continue
+                #below the cursor's request id when resuming inside its group
+                bound = -after[2] if after is not None and score == after[:2] else None
+
+                #newest first across every profile in the group
+                streams = []
+                for profile in profiles:
+                    members = self._profiles[profile]
+                    end = len(members) if bound is None else bisect.bisect_left(members, (bound,))
+                    streams.append(_newest_first(members, end, profile))
+                for request_id, other_id, profile in heapq.merge(*streams, key=lambda member: member[0], reverse=True):
+                    if other_id == user_id:
+                        continue
+                    page.append((score + (-request_id,), other_id, profile))
+                    if len(page) > limit:
+                        break
+                if len(page) > limit:
+                    break
+
+            self._stats['matches'] += 1
+
+        results = []
+        for key, other_id, (other_speaks, other_learning) in page[:limit]:
+            results.append({
+                'user_id': other_id,
+                'speaks': sorted(other_speaks),
+                'learning': sorted(other_learning),
+                'teaches': sorted(other_speaks & learning),
+                'wants': sorted(other_learning & speaks),
+                'reciprocal': -key[0] == RECIPROCAL,
+                'cursor': encode_match_cursor(key)
+            })
+        return results, len(page) > limit
+
+    def _score_profiles(self, speaks, learning):
+        #caller must hold the lock
+        #profiles that can teach me something, and profiles I can teach something
+        profiles = set().union(
+            *(self._speakers.get(lang, ()) for lang in learning),
+            *(self._learners.get(lang, ()) for lang in speaks)
+        )
+
+        #score each profile once; everyone in it shares the same tier and fit
+        groups = {}
+        for profile in profiles:
+            other_speaks, other_learning = profile
+            teaches = len(other_speaks & learning)
+            wants = len(other_learning & speaks)
+            tier = RECIPROCAL if teaches and wants else ONE_SIDED
+            #negated so the best match sorts first
+            groups.setdefault((-tier, -(teaches + wants)), []).append(profile)
+        self._stats['profiles_scored'] += len(profiles)
+
+        groups = sorted(groups.items())
+        if len(self._scored) >= MAX_SCORED_PROFILES:
+            self._scored.clear()
+        self._scored[(speaks, learning)] = groups
+        return groups
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['requests'] = len(self._requests)
+            stats['profiles'] = len(self._profiles)
+            stats['scored_profiles_cached'] = len(self._scored)
+            stats['languages'] = len(set(self._speakers) | set(self._learners))
+            stats['loaded'] = self._loaded
+        return stats
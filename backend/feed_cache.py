@@ -0,0 +1,154 @@
+import threading
+import uuid
+from collections import OrderedDict
+
+#feed pages kept in memory; 0 turns the cache off
+DEFAULT_MAX_PAGES = 50
+
+def original_id(post):
+    """Likes always belong to the original post, never to a repost"""
+    return post['reposted_from'] or post['id']
+
+class FeedCache:
+    """In-process cache of social feed pages and the like counts shown on them.
+
+    Pages are keyed by (cursor, limit). A new post can only land on the newest
+    page, so creating or reposting drops just the pages without a cursor;
+    older pages stay valid. Like counts are kept apart from the pages and
+    written through on every toggle, so a like never evicts a page.
+
+    Every change bumps ``version``, which the feed serves as its ETag. A page
+    read from the database is only cached if no change happened meanwhile.
+    ``version`` restarts at 0 with the process, so ETags also carry ``epoch``,
+    a token picked at startup; a client's old ETag can't match after a restart.
+
+    Repairs run outside the server (``database.py --rebuild-likes``) bump a
+    generation stored in the database instead. The feed reads it on every
+    request and passes it to ``sync_generation``, which drops the whole cache
+    once it moves.
+    """
+
+    def __init__(self, max_pages=DEFAULT_MAX_PAGES):
+        self.max_pages = max_pages
+        self.epoch = uuid.uuid4().hex[:12]
+        self._version = 0
+        self._generation = None
+        self._pages = OrderedDict()
+        self._like_counts = {}
+        self._lock = threading.Lock()
+        #orders like commits with their write-through so totals can't go backwards
+        self._commit_lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'stale_puts': 0,
+            'evictions': 0,
+            'page_invalidations': 0,
+            'like_updates': 0
+        }
+
+    @property
+    def version(self):
+        return self._version
+
+    def get_page(self, before, limit):
+        """Return a cached page with current like counts, or None"""
+        key = (before, limit)
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                self._stats['misses'] += 1
+                return None
+            self._pages.move_to_end(key)
+            self._stats['hits'] += 1
+            posts = [
+                dict(post, like_count=self._like_counts[original_id(post)])
+                for post in page['posts']
+            ]
+        return dict(page, posts=posts)
+
+    def put_page(self, before, limit, page, version):
+        """Cache a page that was read from the database while the cache was at ``version``"""
+        if self.max_pages <= 0:
+            return False
+        with self._lock:
+            #something changed while the page was being read, so it may already be stale
+            if version != self._version:
+                self._stats['stale_puts'] += 1
+                return False
+            for post in page['posts']:
+                self._like_counts[original_id(post)] = post['like_count']
+            self._pages[(before, limit)] = page
+            self._pages.move_to_end((before, limit))
+            evicted = False
+            while len(self._pages) > self.max_pages:
+                self._pages.popitem(last=False)
+                self._stats['evictions'] += 1
+                evicted = True
+            if evicted:
+                self._prune_like_counts()
+        return True
+
+    def invalidate_newest(self):
+        """A post was created or reposted: drop the pages it can appear on"""
+        with self._lock:
+            self._version += 1
+            newest = [key for key in self._pages if key[0] is None]
+            for key in newest:
+                del self._pages[key]
+            self._stats['page_invalidations'] += len(newest)
+            self._prune_like_counts()
+
+    def commit_like(self, conn, post_id, count):
+        """Commit a like toggle and write the post's new total through.
+
+        Toggles already serialize on the database write lock; holding
+        ``_commit_lock`` across commit and write-through keeps the cache
+        updates in that same order.
+        """
+        with self._commit_lock:
+            conn.commit()
+            with self._lock:
+                self._version += 1
+                if post_id in self._like_counts:
+                    self._like_counts[post_id] = count
+                    self._stats['like_updates'] += 1
+
+    def sync_generation(self, generation):
+        """Drop everything cached if the database's feed generation has moved"""
+        with self._lock:
+            if generation == self._generation:
+                return
+            self._generation = generation
+            self._clear()
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        #caller must hold the lock
+        self._version += 1
+        self._pages.clear()
+        self._like_counts.clear()
+
+    def _prune_like_counts(self):
+        #caller must hold the lock; forget counts that no cached page shows
+        shown = {original_id(post) for page in self._pages.values() for post in page['posts']}
+        self._like_counts = {
+            post_id: count for post_id, count in self._like_counts.items() if post_id in shown
+        }
+
+    def stats(self):
+        """Return hit/miss/invalidation counters and current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pages'] = len(self._pages)
+            stats['like_counts'] = len(self._like_counts)
+            stats['version'] = self._version
+            stats['generation'] = self._generation
+        stats['epoch'] = self.epoch
+        stats['max_pages'] = self.max_pages
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
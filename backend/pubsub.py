@@ -0,0 +1,93 @@
+import queue
+import threading
+import time
+
+#events buffered per subscriber before it is considered too slow and dropped
+DEFAULT_MAX_PENDING = 256
+
+class Subscription:
+    """One listener's queue of (event, payload) pairs from one or more channels"""
+
+    def __init__(self, channels, max_pending=DEFAULT_MAX_PENDING):
+        self.channels = tuple(channels)
+        self.closed = False
+        self._queue = queue.Queue(max_pending)
+
+    def get(self, timeout=None):
+        """Return the next (event, payload), or None on timeout or once closed"""
+        if self.closed:
+            return None
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _offer(self, item):
+        #never block the publisher; a full queue means the listener fell behind
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.closed = True
+            return False
+
+class PubSubHub:
+    """In-process publish/subscribe fan-out for server-push endpoints.
+
+    Publishing never blocks: a subscriber whose queue fills up is closed
+    instead, and is expected to reconnect and catch up from the database.
+    """
+
+    def __init__(self, max_pending=DEFAULT_MAX_PENDING):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._stats = {'published': 0, 'delivered': 0, 'dropped_subscribers': 0, 'total_subscriptions': 0}
+
+    def subscribe(self, channels):
+        subscription = Subscription(channels, self.max_pending)
+        with self._lock:
+            for channel in subscription.channels:
+                self._channels.setdefault(channel, set()).add(subscription)
+            self._stats['total_subscriptions'] += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.closed = True
+        with self._lock:
+            for channel in subscription.channels:
+                listeners = self._channels.get(channel)
+                if listeners is not None:
+                    listeners.discard(subscription)
+                    if not listeners:
+                        del self._channels[channel]
+
+    def publish(self, channel, event, payload):
+        """Send an event to everyone subscribed to ``channel``; returns how many received it"""
+        with self._lock:
+            listeners = list(self._channels.get(channel, ()))
+            self._stats['published'] += 1
+
+        #stamp the event so clients (and the load test) can measure delivery latency
+        payload = dict(payload, published_at=time.time())
+        delivered = 0
+        dropped = []
+        for subscription in listeners:
+            if subscription._offer((event, payload)):
+                delivered += 1
+            else:
+                dropped.append(subscription)
+
+        for subscription in dropped:
+            self.unsubscribe(subscription)
+        with self._lock:
+            self._stats['delivered'] += delivered
+            self._stats['dropped_subscribers'] += len(dropped)
+        return delivered
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['channels'] = len(self._channels)
+            stats['subscribers'] = len({s for listeners in self._channels.values() for s in listeners})
+        return stats
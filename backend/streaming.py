@@ -0,0 +1,226 @@
+import queue
+import threading
+import time
+import uuid
+from audio import SAMPLE_RATE, StreamingDecoder
+from whisper_pool import TranscriptionRejected
+
+#re-transcribe once this much new audio has arrived
+STEP_SECONDS = 1.0
+#once the uncommitted window grows past this, finished segments are committed
+WINDOW_SECONDS = 12.0
+#windows shorter than this are not worth a whisper pass
+MIN_WINDOW_SECONDS = 0.3
+#longest recording a session takes; past this it finishes as if the client ended it
+MAX_SESSION_SECONDS = 600
+#sessions with no activity for this long are dropped
+IDLE_TIMEOUT_SECONDS = 120
+#how often the manager looks for abandoned sessions
+REAP_INTERVAL_SECONDS = 30
+
+class StreamSession:
+    """Incremental transcription of one live recording.
+
+    Audio chunks are decoded as they arrive and the uncommitted tail of the
+    recording is re-transcribed over a sliding window; committed audio is
+    dropped. Transcripts are translated on a separate thread so a slow
+    translation never holds up the next whisper pass, and a partial that has
+    already been superseded is skipped. Results are pushed onto ``events`` as
+    ('partial' | 'final' | 'error' | 'done', payload) tuples.
+    """
+
+    def __init__(self, stream_id, target_language, transcribe, translate):
+        self.stream_id = stream_id
+        self.target_language = target_language
+        self.events = queue.Queue()
+        self.last_active = time.time()
+        self._transcribe = transcribe
+        self._translate = translate
+        self._decoder = StreamingDecoder()
+        self._committed = 0
+        self._final_text = []
+        self._ended = threading.Event()
+        #transcripts waiting for translation, tagged with a sequence number
+        self._outbox = queue.Queue()
+        self._sent = 0
+        self._translator = threading.Thread(target=self._deliver, daemon=True)
+        self._translator.start()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def feed(self, data):
+        """Add another chunk of encoded audio"""
+        if self._ended.is_set():
+            raise ValueError('Stream has ended')
+        self.last_active = time.time()
+        self._decoder.write(data)
+
+    def end(self):
+        """Mark the recording finished; a final pass runs on the remaining audio"""
+        self.last_active = time.time()
+        self._ended.set()
+
+    @property
+    def finished(self):
+        return not self._worker.is_alive() and not self._translator.is_alive()
+
+    def _emit(self, event, payload):
+        #only the worker thread sends, so the counter needs no lock
+        self._sent += 1
+        self._outbox.put((self._sent, event, payload))
+
+    def _translation(self, text):
+        try:
+            return self._translate(text, self.target_language) if text else ''
+        except Exception as e:
+            print(f"Stream translation error: {e}")
+            return None
+
+    def _deliver(self):
+        #translate transcripts in the order they were heard and pass them on
+        while True:
+            seq, event, payload = self._outbox.get()
+            if event == 'partial' and seq != self._sent:
+                #a newer transcript is already queued behind this one
+                continue
+            if event in ('partial', 'final'):
+                payload = {'text': payload, 'translated_text': self._translation(payload)}
+            self.events.put((event, payload))
+            if event in ('done', 'error'):
+                break
+
+    def _run(self):
+        step = int(STEP_SECONDS * SAMPLE_RATE)
+        max_samples = int(MAX_SESSION_SECONDS * SAMPLE_RATE)
+        processed = 0
+        try:
+            while True:
+                ended = self._ended.is_set()
+                if not ended and self._decoder.sample_count >= max_samples:
+                    print(f"Stream {self.stream_id} reached {MAX_SESSION_SECONDS}s; finishing it")
+                    self._ended.set()
+                    ended = True
+                if ended:
+                    #flush whatever ffmpeg still holds before the last pass
+                    self._decoder.close()
+                total = self._decoder.sample_count
+
+                if not ended and total - processed < step:
+                    #ffmpeg only exits early on input it can't decode; waiting would spin forever
+                    if self._decoder.closed:
+                        raise RuntimeError('Audio decoder stopped before the stream ended')
+                    self._decoder.wait_for(processed + step, timeout=0.5)
+                    continue
+
+                processed = total
+                self._process_window(total, final=ended)
+                if ended:
+                    break
+
+            self._emit('done', {'text': ' '.join(self._final_text)})
+        except Exception as e:
+            print(f"Stream {self.stream_id} failed: {e}")
+            self._decoder.close()
+            self._emit('error', {'error': str(e)})
+
+    def _process_window(self, total, final):
+        window = self._decoder.samples(self._committed, total)
+        if len(window) < MIN_WINDOW_SECONDS * SAMPLE_RATE:
+            return
+
+        try:
+            result = self._transcribe(window)
+        except TranscriptionRejected as e:
+            #a busy pool only delays partials; the final pass must report it
+            if final:
+                raise
+            print(f"Stream {self.stream_id} skipped a partial: {e}")
+            return
+
+        segments = result['segments']
+        full_window = len(window) >= WINDOW_SECONDS * SAMPLE_RATE
+
+        if final or (full_window and len(segments) <= 1):
+            #commit everything heard so far
+            committed_text = result['text'].strip()
+            pending_text = ''
+            self._committed = total
+        elif full_window:
+            #commit finished segments, keep re-transcribing the last one
+            done = segments[:-1]
+            committed_text = ''.join(seg['text'] for seg in done).strip()
+            pending_text = segments[-1]['text'].strip()
+            self._committed += int(done[-1]['end'] * SAMPLE_RATE)
+        else:
+            committed_text = ''
+            pending_text = result['text'].strip()
+
+        #committed audio is never re-transcribed
+        self._decoder.discard(self._committed)
+
+        if committed_text:
+            self._final_text.append(committed_text)
+            self._emit('final', committed_text)
+        if pending_text:
+            self._emit('partial', pending_text)
+
+    def close(self):
+        self._ended.set()
+        self._decoder.close()
+
+class StreamManager:
+    """Registry of live transcription sessions.
+
+    A background thread drops sessions abandoned by their client, so their
+    ffmpeg process and worker thread don't outlive the recording.
+    """
+
+    def __init__(self, transcribe, translate, reap_interval=REAP_INTERVAL_SECONDS):
+        self._transcribe = transcribe
+        self._translate = translate
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._reaper = threading.Thread(target=self._reap_periodically, args=(reap_interval,), daemon=True)
+        self._reaper.start()
+
+    def create(self, target_language):
+        stream_id = uuid.uuid4().hex
+        session = StreamSession(stream_id, target_language, self._transcribe, self._translate)
+        with self._lock:
+            self._sessions[stream_id] = session
+        return session
+
+    def get(self, stream_id):
+        with self._lock:
+            return self._sessions.get(stream_id)
+
+    def remove(self, stream_id):
+        with self._lock:
+            session = self._sessions.pop(stream_id, None)
+        if session:
+            session.close()
+
+    def _reap(self):
+        #drop sessions abandoned by their client
+        cutoff = time.time() - IDLE_TIMEOUT_SECONDS
+        with self._lock:
+            stale = [sid for sid, s in self._sessions.items() if s.last_active < cutoff]
+        for stream_id in stale:
+            print(f"Dropping idle stream {stream_id}")
+            self.remove(stream_id)
+
+    def _reap_periodically(self, interval):
+        while not self._stopped.wait(interval):
+            try:
+                self._reap()
+            except Exception as e:
+                print(f"Stream reaper error: {e}")
+
+    def shutdown(self):
+        """Stop the reaper and close every open session"""
+        self._stopped.set()
+        with self._lock:
+            stream_ids = list(self._sessions)
+        for stream_id in stream_ids:
+            self.remove(stream_id)
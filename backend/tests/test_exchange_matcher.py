@@ -0,0 +1,106 @@
+"""Checks that exchange_matcher pages agree with a brute-force ranking.
+
+Run from the backend directory:
+    python -m unittest discover tests
+"""
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import database
+from exchange_matcher import (BROWSE_MODE, MATCH_MODE, ONE_SIDED, RECIPROCAL, ExchangeMatcher,
+                              decode_match_cursor, encode_match_cursor)
+
+LANGUAGES = ['en', 'es', 'fr', 'ar', 'de', 'it']
+
+def brute_force(requests, user_id):
+    """Rank every other request by (tier, overlap, newest) the slow way"""
+    _, speaks, learning = requests[user_id]
+    ranked = []
+    for other_id, (request_id, other_speaks, other_learning) in requests.items():
+        if other_id == user_id:
+            continue
+        teaches = len(other_speaks & learning)
+        wants = len(other_learning & speaks)
+        if not teaches and not wants:
+            continue
+        tier = RECIPROCAL if teaches and wants else ONE_SIDED
+        ranked.append(((-tier, -(teaches + wants), -request_id), other_id))
+    return [other_id for _, other_id in sorted(ranked)]
+
+def walk(matcher, user_id, limit):
+    #follow the cursors page by page, as the client does
+    seen = []
+    after = None
+    while True:
+        candidates, has_more = matcher.match(user_id, after, limit)
+        seen.extend(candidate['user_id'] for candidate in candidates)
+        if not has_more:
+            return seen
+        mode, after = decode_match_cursor(candidates[-1]['cursor'])
+        assert mode == MATCH_MODE
+
+class ExchangeMatcherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'matcher.db')
+        database.init_db()
+
+    def setUp(self):
+        rng = random.Random(7)
+        with database.db_connection() as conn:
+            conn.execute('DELETE FROM exchange_requests')
+            for user_id in range(1, 301):
+                speaks = rng.sample(LANGUAGES, rng.randint(1, 3))
+                learning = rng.sample(LANGUAGES, rng.randint(1, 2))
+                conn.execute(
+                    'INSERT INTO exchange_requests (user_id, speaks_languages, learning_languages) VALUES (?, ?, ?)',
+                    (user_id, ','.join(speaks), ','.join(learning))
+                )
+            conn.commit()
+            rows = conn.execute('SELECT id, user_id, speaks_languages, learning_languages FROM exchange_requests')
+            self.requests = {
+                row['user_id']: (row['id'], frozenset(row['speaks_languages'].split(',')),
+                                 frozenset(row['learning_languages'].split(',')))
+                for row in rows
+            }
+            self.matcher = ExchangeMatcher()
+            self.matcher.ensure_loaded(conn)
+        self.next_request_id = max(request_id for request_id, _, _ in self.requests.values()) + 1
+
+    def test_paging_matches_brute_force(self):
+        for user_id in (1, 50, 123, 300):
+            expected = brute_force(self.requests, user_id)
+            for limit in (1, 7, 20, 1000):
+                with self.subTest(user_id=user_id, limit=limit):
+                    self.assertEqual(walk(self.matcher, user_id, limit), expected)
+
+    def test_updates_reorder_matches(self):
+        #republish a few requests with new languages, as /publish-exchange-request does
+        rng = random.Random(11)
+        for user_id in rng.sample(sorted(self.requests), 30):
+            speaks = frozenset(rng.sample(LANGUAGES, rng.randint(1, 3)))
+            learning = frozenset(rng.sample(LANGUAGES, rng.randint(1, 2)))
+            self.requests[user_id] = (self.next_request_id, speaks, learning)
+            self.matcher.update(user_id, self.next_request_id, speaks, learning)
+            self.next_request_id += 1
+
+        for user_id in (1, 50, 123, 300):
+            with self.subTest(user_id=user_id):
+                self.assertEqual(walk(self.matcher, user_id, 9), brute_force(self.requests, user_id))
+
+    def test_cursor_carries_its_mode(self):
+        key = (-RECIPROCAL, -3, -42)
+        self.assertEqual(decode_match_cursor(encode_match_cursor(key)), (MATCH_MODE, key))
+        self.assertEqual(decode_match_cursor(encode_match_cursor(key, BROWSE_MODE)), (BROWSE_MODE, key))
+        for bad in ('2|3|42', 'x|2|3|42', 'm|2|3', 'm|a|b|c'):
+            with self.subTest(cursor=bad):
+                with self.assertRaises(ValueError):
+                    decode_match_cursor(bad)
+
+if __name__ == '__main__':
+    unittest.main()
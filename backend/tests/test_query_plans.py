@@ -0,0 +1,125 @@
+"""Check that the hot-path queries use indexes instead of full table scans.
+
+Builds a throwaway database with every migration applied and asserts that
+no query plan reads a whole table. The queries are the SQL constants
+app.py runs, imported from database.py. The few scans that are expected
+are listed per query in ALLOWED_SCANS, each with the reason it is cheap.
+
+Run from the backend directory:
+    python -m unittest discover tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import database
+
+#every hot query with placeholder parameters
+HOT_QUERIES = {
+    'conversation_page': (database.CONVERSATION_PAGE_SQL, (1, 2, '~', 0, 51, 2, 1, '~', 0, 51, 51)),
+    'conversation_since': (database.CONVERSATION_SINCE_SQL, (1, 2, '', 0, 201, 2, 1, '', 0, 201, 201)),
+    'conversation_version': (database.CONVERSATION_VERSION_SQL, (1, 2, 2, 1, 1, 2, 2, 1)),
+    'message_timestamp': (database.MESSAGE_TIMESTAMP_SQL, (1,)),
+    'count_unread': (database.COUNT_UNREAD_SQL, (1, 2)),
+    'has_unread': (database.HAS_UNREAD_SQL, (1, 2)),
+    'mark_read': (database.MARK_READ_SQL, (1, 2)),
+    'clear_unread': (database.CLEAR_UNREAD_SQL, (1, 2)),
+    'unread_counters': (database.UNREAD_COUNTERS_SQL, (1,)),
+    'friends': (database.FRIENDS_SQL, (1, 1, 1, 1, 1, 1)),
+    'search_first_users': (
+        database.SEARCH_WITH_FRIENDSHIP_SQL.format(page_sql=database.SEARCH_FIRST_USERS_SQL),
+        (1, 20, 1, 1)
+    ),
+    'search_username_prefix': (
+        database.SEARCH_WITH_FRIENDSHIP_SQL.format(page_sql=database.SEARCH_USERNAME_PREFIX_SQL),
+        ('al%', 1, 20, 1, 1)
+    ),
+    'search_users_trigram': (
+        database.SEARCH_WITH_FRIENDSHIP_SQL.format(page_sql=database.SEARCH_USERS_TRIGRAM_SQL),
+        ('"ali"', 1, 20, 1, 1)
+    ),
+    'feed_page': (database.FEED_PAGE_SQL, ('~', 0, 21)),
+    'feed_generation': (database.FEED_GENERATION_SQL, ()),
+    'feed_liked': (database.FEED_LIKED_SQL.format(placeholders='?, ?, ?'), (1, 1, 2, 3)),
+    'like_insert': (database.LIKE_INSERT_SQL, (1, 1)),
+    'like_delete': (database.LIKE_DELETE_SQL, (1, 1)),
+    'like_count_update': (database.LIKE_COUNT_UPDATE_SQL, (1, 1)),
+    'like_count': (database.LIKE_COUNT_SQL, (1,)),
+    'post_like_count': (database.POST_LIKE_COUNT_SQL, (1,)),
+    'post_liked': (database.POST_LIKED_SQL, (1, 1)),
+    'exchange_browse': (database.EXCHANGE_BROWSE_SQL, (1, 2 ** 62, 21)),
+}
+
+#plan lines that scan without an index but are known to be cheap, per query
+ALLOWED_SCANS = {
+    'conversation_page': {
+        'SCAN direction_page': 'each direction is already cut to LIMIT rows by idx_messages_conversation'
+    },
+    'conversation_since': {
+        'SCAN delta_page': 'each direction is already cut to LIMIT rows by idx_messages_conversation'
+    },
+    'conversation_version': {
+        'SCAN direction_head': 'each direction holds at most one row',
+        'SCAN CONSTANT ROW': 'the outer SELECT only gathers the scalar subqueries'
+    },
+    'search_first_users': {
+        'SCAN search_page': 'the page is already cut to LIMIT rows'
+    },
+    'search_username_prefix': {
+        'SCAN search_page': 'the page is already cut to LIMIT rows'
+    },
+    'search_users_trigram': {
+        'SCAN search_page': 'the page is already cut to LIMIT rows',
+        #the index string after this prefix varies between SQLite versions
+        'SCAN users_search VIRTUAL TABLE INDEX': 'FTS5 answers MATCH from its own trigram index'
+    },
+    'feed_page': {
+        'SCAN feed_page': 'the page is already cut to LIMIT rows by idx_posts_created_at'
+    },
+}
+
+def allows(entry, detail):
+    #an entry matches a whole plan line, or the start of one up to a space
+    return detail == entry or detail.startswith(entry + ' ')
+
+def unindexed_scans(plan):
+    #"SCAN x USING [COVERING] INDEX" walks an index in order; a bare SCAN reads every row
+    return [detail for detail in plan if detail.startswith('SCAN') and ' USING ' not in detail]
+
+class QueryPlanTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        database.DB_PATH = os.path.join(tempfile.mkdtemp(), 'plans.db')
+        database.init_db()
+
+    def plan(self, name):
+        sql, params = HOT_QUERIES[name]
+        with database.db_connection() as conn:
+            return [row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+    def test_no_full_table_scans(self):
+        for name in HOT_QUERIES:
+            with self.subTest(query=name):
+                plan = self.plan(name)
+                allowed = ALLOWED_SCANS.get(name, {})
+                unexpected = [
+                    detail for detail in unindexed_scans(plan)
+                    if not any(allows(entry, detail) for entry in allowed)
+                ]
+                self.assertEqual(unexpected, [], 'query plan:\n  ' + '\n  '.join(plan))
+
+    def test_allowed_scans_still_apply(self):
+        #an exemption whose scan no longer appears hides nothing and should be removed
+        for name, allowed in ALLOWED_SCANS.items():
+            with self.subTest(query=name):
+                self.assertIn(name, HOT_QUERIES)
+                plan = self.plan(name)
+                for entry in allowed:
+                    self.assertTrue(any(allows(entry, detail) for detail in plan),
+                                    f'{entry!r} not in plan:\n  ' + '\n  '.join(plan))
+
+if __name__ == '__main__':
+    unittest.main()
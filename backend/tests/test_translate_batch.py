@@ -0,0 +1,166 @@
+"""Checks for translate_batch and TranslatorPool in async_runner.py.
+
+A stub client stands in for googletrans: it tags its output with the
+target language and answers after a random delay, so results come back
+out of order and no network is needed.
+
+Run from the backend directory:
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import random
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from async_runner import BackgroundLoop, TranslatorPool, translate_batch
+
+LANGUAGES = ['es', 'fr', 'ar', 'de', 'it', 'ja']
+SENTENCES = [
+    'Good morning, how are you today?',
+    'Where is the train station?',
+    'I would like a cup of coffee, please.',
+    'My brother is learning to play the guitar.',
+    'The library closes at eight in the evening.',
+    'Can you help me find my keys?'
+]
+
+class StubTranslator:
+    """Offline stand-in for googletrans.Translator that labels its output"""
+
+    class Result:
+        def __init__(self, text):
+            self.text = text
+
+    def __init__(self, tracker):
+        self.tracker = tracker
+
+    async def translate(self, text, src='auto', dest='en'):
+        with self.tracker.lock:
+            self.tracker.calls.append((text, dest))
+            self.tracker.active += 1
+            self.tracker.peak = max(self.tracker.peak, self.tracker.active)
+        try:
+            #random latency so concurrent calls finish out of order
+            await asyncio.sleep(random.uniform(0, 0.01))
+            if text.startswith('fail'):
+                #what googletrans raises when the service answers with an empty page
+                raise Exception('Expecting value: line 1 column 1 (char 0)')
+            return self.Result(f'[{dest}] {text}')
+        finally:
+            with self.tracker.lock:
+                self.tracker.active -= 1
+
+class Tracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+
+class StubTranslatorPool(TranslatorPool):
+    def __init__(self, tracker, size=4):
+        super().__init__(size=size)
+        self.tracker = tracker
+
+    def _new_translator(self):
+        translator = StubTranslator(self.tracker)
+        self._all.append(translator)
+        return translator
+
+def pooled_translate(pool):
+    #the same lease-per-call shape SpeechTranslator.translate_text uses
+    async def translate(text, dest):
+        async with pool.acquire() as lease:
+            return (await lease.translator.translate(text, dest=dest)).text
+    return translate
+
+class TranslateBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.tracker = Tracker()
+        self.pool = StubTranslatorPool(self.tracker, size=4)
+        self.translate = pooled_translate(self.pool)
+
+    def run_batch(self, items, concurrency=8):
+        return asyncio.run(translate_batch(self.translate, items, concurrency))
+
+    def test_results_keep_input_order_and_language(self):
+        rng = random.Random(1)
+        items = [(rng.choice(SENTENCES), rng.choice(LANGUAGES)) for _ in range(40)]
+        results = self.run_batch(items)
+        self.assertEqual(
+            [result['translated_text'] for result in results],
+            [f'[{lang}] {text}' for text, lang in items]
+        )
+
+    def test_repeats_are_translated_once(self):
+        items = [
+            ('Where is the train station?', 'es'),
+            ('Where  is the   train station?', 'es'),
+            ('Where is the train station?', 'fr'),
+            ('Where is the train station?', 'es'),
+        ]
+        results = self.run_batch(items)
+        self.assertEqual(len(self.tracker.calls), 2)
+        self.assertEqual({dest for _, dest in self.tracker.calls}, {'es', 'fr'})
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(results[0], results[3])
+        self.assertEqual(results[2]['translated_text'], '[fr] Where is the train station?')
+
+    def test_failures_stay_with_their_item(self):
+        items = [('hello', 'es'), ('fail here', 'es'), ('goodbye', 'fr')]
+        results = self.run_batch(items)
+        self.assertEqual(results[0], {'status': 'ok', 'translated_text': '[es] hello'})
+        self.assertEqual(results[1]['status'], 'error')
+        self.assertEqual(results[1]['code'], 503)
+        self.assertEqual(results[2], {'status': 'ok', 'translated_text': '[fr] goodbye'})
+
+    def test_concurrency_is_bounded_by_the_batch_limit(self):
+        pool = StubTranslatorPool(self.tracker, size=10)
+        items = [(f'sentence {i}', 'es') for i in range(30)]
+        asyncio.run(translate_batch(pooled_translate(pool), items, concurrency=3))
+        self.assertEqual(len(self.tracker.calls), 30)
+        self.assertLessEqual(self.tracker.peak, 3)
+
+    def test_concurrency_is_bounded_by_the_pool(self):
+        items = [(f'sentence {i}', 'es') for i in range(30)]
+        self.run_batch(items, concurrency=16)
+        self.assertLessEqual(self.tracker.peak, self.pool.size)
+        self.assertGreater(self.tracker.peak, 1)
+
+class SharedLoopTest(unittest.TestCase):
+    def test_threads_sharing_one_loop_get_their_own_results(self):
+        #Flask worker threads all run their batches on one background loop
+        tracker = Tracker()
+        pool = StubTranslatorPool(tracker, size=4)
+        translate = pooled_translate(pool)
+        loop = BackgroundLoop(name='test-loop')
+        failures = []
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(10):
+                items = [(rng.choice(SENTENCES), rng.choice(LANGUAGES)) for _ in range(rng.randint(4, 12))]
+                results = loop.run(translate_batch(translate, items), timeout=10)
+                expected = [{'status': 'ok', 'translated_text': f'[{lang}] {text}'} for text, lang in items]
+                if results != expected:
+                    with lock:
+                        failures.append((items, results))
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(16)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            loop.shutdown()
+        self.assertEqual(failures, [])
+        self.assertLessEqual(tracker.peak, pool.size)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+"""Checks for the energy-based silence trimming in vad.py.
+
+Run from the backend directory:
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+
+from audio import SAMPLE_RATE
+from vad import VoiceActivityDetector, speech_regions
+
+def voiced(seconds, level=0.25):
+    """A voiced-sounding signal: harmonics of 150 Hz with a syllable-rate swell"""
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    tone = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 5))
+    envelope = level * (1 + 0.6 * np.sin(2 * np.pi * 4 * t))
+    return (envelope * tone / 2).astype(np.float32)
+
+def silence(seconds, level=0.001):
+    rng = np.random.default_rng(0)
+    return (rng.standard_normal(int(seconds * SAMPLE_RATE)) * level).astype(np.float32)
+
+class SpeechRegionsTest(unittest.TestCase):
+    def test_speech_only_clip_is_kept_whole(self):
+        #no pause anywhere, so the quietest frames are still speech
+        audio = voiced(3.0)
+        self.assertEqual(speech_regions(audio), [(0, len(audio))])
+
+    def test_surrounding_silence_is_trimmed(self):
+        audio = np.concatenate([silence(2.0), voiced(2.0), silence(2.0)])
+        regions = speech_regions(audio)
+        self.assertEqual(len(regions), 1)
+        start, end = regions[0]
+        self.assertLess(start, 2.0 * SAMPLE_RATE)
+        self.assertGreater(start, 1.5 * SAMPLE_RATE)
+        self.assertGreater(end, 4.0 * SAMPLE_RATE)
+        self.assertLess(end, 4.5 * SAMPLE_RATE)
+
+    def test_silence_has_no_speech(self):
+        self.assertEqual(speech_regions(silence(3.0)), [])
+
+class SplitTest(unittest.TestCase):
+    def test_long_clip_splits_at_pauses(self):
+        audio = np.concatenate([voiced(4.0), silence(1.0), voiced(4.0), silence(1.0), voiced(4.0)])
+        chunks = VoiceActivityDetector(split_seconds=6.0).split(audio)
+        self.assertEqual(len(chunks), 3)
+
+if __name__ == '__main__':
+    unittest.main()
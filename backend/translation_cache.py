@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+from database import db_connection
+
+#default limits for the in-memory tier
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_TTL_SECONDS = 60 * 60 * 24
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different inputs share a cache entry"""
+    return ' '.join(text.split())
+
+class TranslationCache:
+    """Two-tier translation cache: in-process LRU backed by a SQLite table"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'db_hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0
+        }
+
+    def _key(self, text, src, dest):
+        return (normalize_text(text), src, dest)
+
+    def _remember(self, key, translated_text, created_at):
+        #caller must hold the lock
+        self._entries[key] = (translated_text, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def get(self, text, src, dest):
+        """Return a cached translation or None"""
+        key = self._key(text, src, dest)
+        now = time.time()
+
+        #check the in-memory tier first
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                translated_text, created_at = entry
+                if now - created_at < self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return translated_text
+                del self._entries[key]
+                self._stats['expirations'] += 1
+
+        #fall back to the persistent tier
+        with db_connection() as conn:
+            row = conn.execute('''
+                SELECT translated_text, created_at FROM translation_cache
+                WHERE source_text = ? AND source_language = ? AND target_language = ?
+            ''', key).fetchone()
+
+            if row and now - row['created_at'] >= self.ttl_seconds:
+                conn.execute('''
+                    DELETE FROM translation_cache
+                    WHERE source_text = ? AND source_language = ? AND target_language = ?
+                ''', key)
+                conn.commit()
+                row = None
+                with self._lock:
+                    self._stats['expirations'] += 1
+
+        with self._lock:
+            if row:
+                self._remember(key, row['translated_text'], row['created_at'])
+                self._stats['db_hits'] += 1
+                return row['translated_text']
+            self._stats['misses'] += 1
+        return None
+
+    def set(self, text, src, dest, translated_text):
+        """Store a translation in both tiers"""
+        key = self._key(text, src, dest)
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, translated_text, now)
+
+        with db_connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO translation_cache
+                    (source_text, source_language, target_language, translated_text, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', key + (translated_text, now))
+            conn.commit()
+
+    def clear(self):
+        """Drop every entry from both tiers"""
+        with self._lock:
+            self._entries.clear()
+        with db_connection() as conn:
+            conn.execute('DELETE FROM translation_cache')
+            conn.commit()
+
+    def stats(self):
+        """Return hit/miss/eviction counters and current size"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        stats['ttl_seconds'] = self.ttl_seconds
+        lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['db_hits']) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+#default size limit for the on-disk cache
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+#how many not-yet-synthesized requests to remember for streaming
+MAX_PENDING_REQUESTS = 1000
+
+def audio_key(text, lang):
+    """Content address for a piece of generated speech"""
+    return hashlib.sha256(f"{lang}\0{text}".encode('utf-8')).hexdigest()
+
+class TTSCache:
+    """Content-addressed on-disk cache of generated mp3 files.
+
+    Files are named by hash(text, lang), so a given URL always refers to the
+    same audio. The least recently used files are evicted once the total
+    size passes ``max_bytes``.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._requests = OrderedDict()
+        self._entries = {}
+        self._total_bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'stale_parts_removed': 0}
+
+        #index whatever survived from a previous run
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith('.mp3'):
+                stat = os.stat(path)
+                self._entries[name[:-4]] = (stat.st_size, stat.st_mtime)
+                self._total_bytes += stat.st_size
+            elif name.endswith('.part'):
+                #left behind by a crash mid-render; nothing will ever finish it
+                try:
+                    os.remove(path)
+                    self._stats['stale_parts_removed'] += 1
+                except OSError as e:
+                    print(f"Could not remove stale TTS part file {name}: {e}")
+        self._evict()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f"{key}.mp3")
+
+    def has(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def open(self, key):
+        """Open a cached file for reading and mark it recently used; None if it isn't cached.
+
+        The handle stays readable even if the file is evicted while it is
+        being sent.
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            try:
+                f = open(self.path_for(key), 'rb')
+            except FileNotFoundError:
+                #removed behind our back; forget it so it is regenerated
+                self._total_bytes -= self._entries.pop(key)[0]
+                return None
+            size, _ = self._entries[key]
+            self._entries[key] = (size, time.time())
+        return f
+
+    def touch(self, key):
+        """Mark a cached file as recently used"""
+        with self._lock:
+            if key in self._entries:
+                size, _ = self._entries[key]
+                self._entries[key] = (size, time.time())
+
+    def remember_request(self, text, lang):
+        """Record (text, lang) under its key so it can be synthesized later by key"""
+        key = audio_key(text, lang)
+        with self._lock:
+            self._requests[key] = (text, lang)
+            self._requests.move_to_end(key)
+            while len(self._requests) > MAX_PENDING_REQUESTS:
+                self._requests.popitem(last=False)
+        return key
+
+    def lookup_request(self, key):
+        """Return the (text, lang) remembered for a key, or None"""
+        with self._lock:
+            return self._requests.get(key)
+
+    def put(self, key, data):
+        """Store already generated audio under its key"""
+        fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path_for(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries[key][0]
+            self._entries[key] = (len(data), time.time())
+            self._total_bytes += len(data)
+            self._requests.pop(key, None)
+            self._evict()
+
+    def get_or_create(self, text, lang, synthesize):
+        """Return the key for (text, lang), calling synthesize(text, lang, path) on a miss"""
+        key = audio_key(text, lang)
+
+        with self._lock:
+            if key in self._entries:
+                size, _ = self._entries[key]
+                self._entries[key] = (size, time.time())
+                self._stats['hits'] += 1
+                return key
+            #one lock per key so concurrent requests synthesize it only once
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            if self.has(key):
+                self.touch(key)
+                with self._lock:
+                    self._stats['hits'] += 1
+                return key
+
+            #write to a temp file first so readers never see a partial mp3
+            fd, tmp_path = tempfile.mkstemp(suffix='.part', dir=self.directory)
+            os.close(fd)
+            try:
+                synthesize(text, lang, tmp_path)
+                os.replace(tmp_path, self.path_for(key))
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                with self._lock:
+                    self._key_locks.pop(key, None)
+                raise
+
+            size = os.path.getsize(self.path_for(key))
+            with self._lock:
+                self._entries[key] = (size, time.time())
+                self._total_bytes += size
+                self._stats['misses'] += 1
+                self._key_locks.pop(key, None)
+                self._evict()
+
+        return key
+
+    def _evict(self):
+        #caller must hold the lock; drop least recently used files over the limit
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if self._total_bytes <= self.max_bytes or len(self._entries) <= 1:
+                break
+            try:
+                os.remove(self.path_for(key))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                #still open for sending on platforms that can't unlink open files; retry later
+                continue
+            del self._entries[key]
+            self._total_bytes -= size
+            self._stats['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['total_bytes'] = self._total_bytes
+        stats['max_bytes'] = self.max_bytes
+        return stats
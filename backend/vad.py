@@ -0,0 +1,136 @@
+import threading
+import numpy as np
+from audio import SAMPLE_RATE
+
+#analysis frame length for the energy detector
+FRAME_SECONDS = 0.03
+#frames quieter than this RMS (about -40 dBFS) are never speech
+MIN_SPEECH_RMS = 0.01
+#speech must be this many times louder than the clip's noise floor
+NOISE_FLOOR_RATIO = 3.0
+#noise floor estimates above this (about -34 dBFS) mean the clip had no real
+#pause to measure, e.g. speech from start to end, so they are capped here
+MAX_NOISE_FLOOR_RMS = 0.02
+#audio kept on either side of detected speech so word edges aren't clipped
+PAD_SECONDS = 0.2
+#pauses shorter than this are kept inside a speech region
+MIN_SILENCE_SECONDS = 0.5
+#bursts shorter than this (clicks, bumps) are treated as noise
+MIN_SPEECH_SECONDS = 0.15
+#clips longer than this are split at pauses and transcribed in parallel
+DEFAULT_SPLIT_SECONDS = 30.0
+
+def _frame_rms(audio, frame):
+    usable = len(audio) - (len(audio) % frame)
+    frames = audio[:usable].reshape(-1, frame)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+def speech_regions(audio):
+    """Return (start, end) sample ranges that contain speech, in order"""
+    frame = int(FRAME_SECONDS * SAMPLE_RATE)
+    if len(audio) < frame:
+        return []
+
+    rms = _frame_rms(audio, frame)
+    #estimate the background level from the quietest frames; a clip without
+    #pauses has speech in those frames too, so don't let it raise the bar
+    noise_floor = min(np.percentile(rms, 10), MAX_NOISE_FLOOR_RMS)
+    threshold = max(MIN_SPEECH_RMS, noise_floor * NOISE_FLOOR_RATIO)
+    active = rms > threshold
+    if not active.any():
+        return []
+
+    #turn runs of active frames into sample ranges
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], active.astype(np.int8), [0]))))
+    runs = [(start * frame, end * frame) for start, end in zip(edges[::2], edges[1::2])]
+
+    pad = int(PAD_SECONDS * SAMPLE_RATE)
+    min_silence = int(MIN_SILENCE_SECONDS * SAMPLE_RATE)
+    min_speech = int(MIN_SPEECH_SECONDS * SAMPLE_RATE)
+
+    #merge runs separated by short pauses, tracking how much of each is voiced
+    merged = []
+    for start, end in runs:
+        if merged and start - merged[-1][1] < min_silence:
+            merged[-1][1] = end
+            merged[-1][2] += end - start
+        else:
+            merged.append([start, end, end - start])
+
+    regions = []
+    for start, end, voiced in merged:
+        if voiced < min_speech:
+            continue
+        start, end = max(0, start - pad), min(len(audio), end + pad)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+def group_regions(regions, max_samples):
+    """Group consecutive regions into chunks of at most max_samples of speech.
+
+    Chunks only break at pauses, so a single region longer than the limit
+    stays whole.
+    """
+    chunks = []
+    size = 0
+    for start, end in regions:
+        if chunks and size + (end - start) <= max_samples:
+            chunks[-1].append((start, end))
+            size += end - start
+        else:
+            chunks.append([(start, end)])
+            size = end - start
+    return chunks
+
+class VoiceActivityDetector:
+    """Energy-based silence trimming in front of Whisper.
+
+    ``split`` drops leading, trailing and long in-between silence and returns
+    the remaining speech as one or more chunks, broken at pauses once a clip
+    is longer than ``split_seconds``. An empty list means there was nothing
+    worth transcribing.
+    """
+
+    def __init__(self, split_seconds=DEFAULT_SPLIT_SECONDS):
+        self.split_seconds = split_seconds
+        self._lock = threading.Lock()
+        self._stats = {
+            'clips': 0,
+            'empty_clips': 0,
+            'split_clips': 0,
+            'chunks': 0,
+            'input_seconds': 0.0,
+            'kept_seconds': 0.0
+        }
+
+    def has_speech(self, audio):
+        return bool(speech_regions(audio))
+
+    def split(self, audio):
+        regions = speech_regions(audio)
+        chunks = [
+            np.concatenate([audio[start:end] for start, end in group])
+            for group in group_regions(regions, int(self.split_seconds * SAMPLE_RATE))
+        ]
+
+        with self._lock:
+            self._stats['clips'] += 1
+            self._stats['input_seconds'] += len(audio) / SAMPLE_RATE
+            self._stats['kept_seconds'] += sum(len(chunk) for chunk in chunks) / SAMPLE_RATE
+            self._stats['chunks'] += len(chunks)
+            if not chunks:
+                self._stats['empty_clips'] += 1
+            elif len(chunks) > 1:
+                self._stats['split_clips'] += 1
+        return chunks
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['dropped_seconds'] = stats['input_seconds'] - stats['kept_seconds']
+        stats['dropped_ratio'] = stats['dropped_seconds'] / stats['input_seconds'] if stats['input_seconds'] else 0.0
+        stats['split_seconds'] = self.split_seconds
+        return stats
@@ -0,0 +1,368 @@
+import functools
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+
+#per-process whisper model and decoding options, set once by the worker initializer
+_model = None
+_decode_options = {}
+_max_beam_size = None
+
+#'standard' runs full precision; 'quantized' applies int8 dynamic quantization
+INFERENCE_MODES = ('standard', 'quantized')
+#smoothing factor for the moving average of job service time
+SERVICE_TIME_ALPHA = 0.2
+
+class TranscriptionRejected(Exception):
+    """Raised when a transcription job is refused or dropped under load"""
+
+    def __init__(self, message, status=503, retry_after=1):
+        super().__init__(message, status, retry_after)
+        self.message = message
+        self.status = status
+        self.retry_after = retry_after
+
+    def __str__(self):
+        return self.message
+
+class DeadlineExceeded(Exception):
+    """Raised inside a worker when a job's deadline passed while it was queued"""
+
+def _available_cores():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def _quantize(model):
+    """Apply int8 dynamic quantization to the model's linear layers"""
+    import torch
+    from whisper.model import Linear as WhisperLinear
+
+    #whisper uses its own Linear subclass, which quantize_dynamic won't match;
+    #swap in plain nn.Linear layers sharing the same weights first
+    def swap(module):
+        for name, child in module.named_children():
+            if isinstance(child, WhisperLinear):
+                plain = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                plain.weight = child.weight
+                plain.bias = child.bias
+                setattr(module, name, plain)
+            else:
+                swap(child)
+
+    swap(model)
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def decode_options_for(mode, beam_size=None, max_beam_size=None):
+    """Whisper decoding options suited to CPU inference in the given mode.
+
+    Both modes decode greedily unless ``beam_size`` asks for beam search,
+    which is then capped at ``max_beam_size``.
+    """
+    #fp16 is unsupported on CPU; turning it off skips whisper's warning and casts
+    options = {'fp16': False}
+    if mode == 'quantized':
+        #greedy decoding without temperature fallback
+        options['temperature'] = 0.0
+    if beam_size:
+        options['beam_size'] = min(beam_size, max_beam_size) if max_beam_size else beam_size
+    return options
+
+def load_model(model_size, mode='standard'):
+    """Load a Whisper model on CPU, quantized if requested"""
+    import whisper
+
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Unknown inference mode '{mode}', expected one of {INFERENCE_MODES}")
+
+    model = whisper.load_model(model_size, device='cpu')
+    if mode == 'quantized':
+        model = _quantize(model)
+    return model
+
+def _init_worker(model_size, core_slices, threads, mode, max_beam_size):
+    """Pin this worker to its slice of cores and load its own Whisper model"""
+    global _model, _decode_options, _max_beam_size
+
+    cores = core_slices.get()
+    if cores and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+
+    import torch
+    torch.set_num_threads(threads)
+
+    print(f"[whisper worker {os.getpid()}] loading '{model_size}' ({mode}) on cores {cores} with {threads} threads")
+    _model = load_model(model_size, mode)
+    _decode_options = decode_options_for(mode)
+    _max_beam_size = max_beam_size
+
+def _ping():
+    return os.getpid()
+
+def _transcribe(audio, options, deadline, with_segments=False):
+    started_at = time.time()
+    #don't spend compute on a job whose caller has already given up
+    if deadline is not None and started_at > deadline:
+        raise DeadlineExceeded(f"Job waited {started_at - deadline:.1f}s past its deadline")
+    options = {**_decode_options, **options}
+    #per-call options get the same cap on beam width, which dominates decoding cost on CPU
+    if _max_beam_size and options.get('beam_size') and options['beam_size'] > _max_beam_size:
+        options['beam_size'] = _max_beam_size
+    result = _model.transcribe(audio, **options)
+
+    if with_segments:
+        #only ship back what callers use, not whisper's token lists
+        output = {
+            'text': result["text"],
+            'segments': [
+                {'start': seg['start'], 'end': seg['end'], 'text': seg['text']}
+                for seg in result.get('segments', [])
+            ]
+        }
+    else:
+        output = result["text"]
+    return output, started_at, time.time()
+
+class WhisperPool:
+    """Pool of worker processes, each holding its own loaded Whisper model.
+
+    Submissions go through admission control: at most ``max_queue`` jobs may be
+    in flight, and a job whose estimated completion would miss its deadline is
+    rejected up front instead of waiting behind the backlog.
+    """
+
+    def __init__(self, model_size='base', workers=None, threads_per_worker=None,
+                 max_queue=None, default_deadline=30, mode='standard', max_beam_size=None):
+        if mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode '{mode}', expected one of {INFERENCE_MODES}")
+
+        cores = _available_cores()
+        self.model_size = model_size
+        self.mode = mode
+        self.max_beam_size = max_beam_size
+        self.threads_per_worker = threads_per_worker or max(1, min(4, len(cores) // 2))
+        self.workers = workers or max(1, len(cores) // self.threads_per_worker)
+        self.max_queue = max_queue or self.workers * 4
+        self.default_deadline = default_deadline
+
+        #prefer fork: spawn/forkserver would re-import app.py in every worker
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else 'spawn')
+
+        #hand each worker its own contiguous slice of cores
+        core_slices = context.Queue()
+        for i in range(self.workers):
+            start = (i * self.threads_per_worker) % len(cores)
+            core_slices.put(cores[start:start + self.threads_per_worker])
+
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(model_size, core_slices, self.threads_per_worker, mode, max_beam_size)
+        )
+
+        #warmup/readiness state
+        self._started_at = time.time()
+        self._ready_pids = set()
+        self._ready_at = None
+        self._warmup_error = None
+
+        #admission state and metrics
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._avg_service = None
+        self._metrics = {
+            'accepted': 0,
+            'completed': 0,
+            'failed': 0,
+            'rejected_queue_full': 0,
+            'rejected_deadline': 0,
+            'expired_in_queue': 0,
+            'cancelled': 0,
+            'total_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0
+        }
+        print(f"Whisper pool: {self.workers} workers x {self.threads_per_worker} threads, "
+              f"queue {self.max_queue}, {mode} mode")
+
+    def warmup(self, block=False):
+        """Start every worker (and load its model) ahead of the first request.
+
+        Model loading happens inside the workers, so by default this returns
+        immediately and readiness is reported through ``status()``.
+        """
+        def on_ready(future):
+            with self._lock:
+                try:
+                    self._ready_pids.add(future.result())
+                except BaseException as e:
+                    self._warmup_error = str(e)
+                    return
+                if self._ready_at is None:
+                    self._ready_at = time.time()
+
+        #the first submit forks all workers; optionally wait for their models to load
+        futures = [self._executor.submit(_ping) for _ in range(self.workers)]
+        for future in futures:
+            future.add_done_callback(on_ready)
+        if block:
+            wait(futures)
+
+    @property
+    def ready(self):
+        """True once at least one worker has its model loaded"""
+        with self._lock:
+            return bool(self._ready_pids)
+
+    def status(self):
+        """Return readiness details for health checks"""
+        with self._lock:
+            return {
+                'ready': bool(self._ready_pids),
+                'model_size': self.model_size,
+                'mode': self.mode,
+                'ready_workers': len(self._ready_pids),
+                'workers': self.workers,
+                'seconds_to_ready': self._ready_at - self._started_at if self._ready_at else None,
+                'error': self._warmup_error
+            }
+
+    def _estimated_wait(self):
+        #caller must hold the lock; rough time until a new job would start
+        if self._avg_service is None:
+            return 0.0
+        waves = self._in_flight // self.workers
+        return waves * self._avg_service
+
+    def _retry_after(self):
+        #caller must hold the lock; seconds until a slot should free up
+        service = self._avg_service or 1.0
+        return max(1, math.ceil(self._estimated_wait() + service))
+
+    def _admit(self, deadline, jobs):
+        #caller must hold the lock; reserve room for a request's jobs or raise TranscriptionRejected
+        if not self._ready_pids:
+            raise TranscriptionRejected('Speech model is still loading', 503, 5)
+
+        if self._in_flight >= self.max_queue:
+            self._metrics['rejected_queue_full'] += 1
+            raise TranscriptionRejected('Transcription queue is full', 429, self._retry_after())
+
+        if self._avg_service is not None and self._estimated_wait() + self._avg_service > deadline:
+            self._metrics['rejected_deadline'] += 1
+            raise TranscriptionRejected('Transcription backlog exceeds the deadline', 503, self._retry_after())
+
+        self._in_flight += jobs
+        self._metrics['accepted'] += jobs
+
+    def _on_job_done(self, job, result, submitted_at):
+        error = None
+        with self._lock:
+            self._in_flight -= 1
+            if job.cancelled():
+                self._metrics['cancelled'] += 1
+            else:
+                try:
+                    output, started_at, finished_at = job.result()
+                except DeadlineExceeded as e:
+                    self._metrics['expired_in_queue'] += 1
+                    error = TranscriptionRejected(str(e), 503, self._retry_after())
+                except BaseException as e:
+                    self._metrics['failed'] += 1
+                    error = e
+
+        #complete the caller's future outside the lock
+        if job.cancelled():
+            result.cancel()
+            return
+        if error is not None:
+            result.set_exception(error)
+            return
+
+        with self._lock:
+            #record queue wait and update the service time estimate
+            waited = max(0.0, started_at - submitted_at)
+            service = finished_at - started_at
+            self._metrics['completed'] += 1
+            self._metrics['total_wait_seconds'] += waited
+            self._metrics['max_wait_seconds'] = max(self._metrics['max_wait_seconds'], waited)
+            if self._avg_service is None:
+                self._avg_service = service
+            else:
+                self._avg_service += SERVICE_TIME_ALPHA * (service - self._avg_service)
+        result.set_result(output)
+
+    def submit_all(self, audios, deadline=None, with_segments=False, **options):
+        """Queue several transcriptions as one request and return their Futures in order.
+
+        The jobs are admitted together, all or none. Like a single job, the
+        request only needs room for one more job, so a long clip split into
+        more chunks than ``max_queue`` is still accepted. Once one job fails,
+        the others still waiting in the queue are cancelled.
+        """
+        deadline = deadline or self.default_deadline
+        with self._lock:
+            self._admit(deadline, len(audios))
+
+        submitted_at = time.time()
+        jobs = []
+        results = []
+        for index, audio in enumerate(audios):
+            try:
+                job = self._executor.submit(_transcribe, audio, options, submitted_at + deadline, with_segments)
+            except BaseException:
+                #give back the slots never used and drop the jobs already queued
+                with self._lock:
+                    self._in_flight -= len(audios) - index
+                for job in jobs:
+                    job.cancel()
+                raise
+            result = Future()
+            job.add_done_callback(functools.partial(self._on_job_done, result=result, submitted_at=submitted_at))
+            jobs.append(job)
+            results.append(result)
+
+        if len(jobs) > 1:
+            #one failed job fails the whole request; don't spend workers on the rest
+            def cancel_rest(result):
+                if result.cancelled() or result.exception() is not None:
+                    for job in jobs:
+                        job.cancel()
+            for result in results:
+                result.add_done_callback(cancel_rest)
+        return results
+
+    def submit(self, audio, deadline=None, with_segments=False, **options):
+        """Queue a transcription and return a Future for its text.
+
+        With ``with_segments`` the Future resolves to a dict holding the text
+        and the segment timings instead. Raises TranscriptionRejected
+        immediately when the queue is full (429) or the job could not finish
+        within ``deadline`` seconds (503).
+        """
+        return self.submit_all([audio], deadline=deadline, with_segments=with_segments, **options)[0]
+
+    def transcribe(self, audio, timeout=None, deadline=None, with_segments=False, **options):
+        return self.submit(audio, deadline=deadline, with_segments=with_segments, **options).result(timeout)
+
+    def metrics(self):
+        """Return queue depth, rejection counts and wait-time statistics"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['in_flight'] = self._in_flight
+            metrics['queued'] = max(0, self._in_flight - self.workers)
+            metrics['estimated_wait_seconds'] = self._estimated_wait()
+            metrics['avg_service_seconds'] = self._avg_service
+        metrics['workers'] = self.workers
+        metrics['max_queue'] = self.max_queue
+        metrics['default_deadline_seconds'] = self.default_deadline
+        completed = metrics['completed']
+        metrics['avg_wait_seconds'] = metrics['total_wait_seconds'] / completed if completed else 0.0
+        return metrics
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -31,11 +31,11 @@ function getLangCode(langName) {
 
 /**
  * 
- * @param {string} base64Audio //MP3 audio data in base64 format
+ * @param {string} audioUrl //URL of the MP3 audio served by the backend
  */
-function playBase64Audio(base64Audio) {
-    //create audio element with data URI
-    const audio = new Audio('data:audio/mp3;base64,' + base64Audio);
+function playAudioUrl(audioUrl) {
+    //create audio element pointing at the cached file
+    const audio = new Audio(audioUrl);
     //play audio and catch errors
     audio.play().catch(error => {
         console.error('Error playing audio:', error);
@@ -151,7 +151,7 @@ window.speak = async function(elementId) {
 
         const data = await response.json();
         //play the returned audio
-        playBase64Audio(data.audio);
+        playAudioUrl(data.audio_url);
 
     } catch (error) {
         console.error('TTS error:', error);
@@ -228,6 +228,81 @@ window.startRecording = async function(isLang1) {
     }
 }
 
+/**
+ * //reads a Server-Sent Events response body and calls onEvent for each event
+ * @param {Response} response
+ * @param {function(string, object)} onEvent
+ */
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        //events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const raw = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            raw.split('\n').forEach(line => {
+                if (line.startsWith('event:')) event = line.slice(6).trim();
+                else if (line.startsWith('data:')) data += line.slice(5).trim();
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
+/**
+ * //plays audio clips one after another in index order, even if they arrive out of order
+ */
+function createSequentialPlayer() {
+    const clips = {};
+    let nextIndex = 0;
+    let playing = false;
+
+    function playNext() {
+        if (playing || !(nextIndex in clips)) return;
+        const url = clips[nextIndex];
+        delete clips[nextIndex];
+        nextIndex++;
+        //skipped clips (failed sentences) are passed over
+        if (!url) {
+            playNext();
+            return;
+        }
+        playing = true;
+        const audio = new Audio(url);
+        audio.onended = audio.onerror = () => {
+            playing = false;
+            playNext();
+        };
+        audio.play().catch(error => {
+            console.error('Error playing audio:', error);
+            playing = false;
+            playNext();
+        });
+    }
+
+    return {
+        add(index, url) {
+            clips[index] = url;
+            playNext();
+        },
+        skip(index) {
+            clips[index] = null;
+            playNext();
+        }
+    };
+}
+
 async function processAudioWithBackend(audioBlob, targetLangCode, sourceInput, targetOutput, sourceLangName) {
     //update UI to indicate processing state
     sourceInput.placeholder = `Processing audio from ${sourceLangName}...`;
@@ -240,29 +315,46 @@ async function processAudioWithBackend(audioBlob, targetLangCode, sourceInput, t
     formData.append('target_language', targetLangCode);
 
     try {
-        //call backend full translation API
-        const response = await fetch(`${API_URL}/full-translation`, {
+        //call backend full translation API, receiving results as they are ready
+        const response = await fetch(`${API_URL}/full-translation/stream`, {
             method: 'POST',
             body: formData
         });
 
-        const result = await response.json();
-        
-        if (response.ok) {
-            //display transcribed text in source input
-            sourceInput.value = result.original_text;
-            //display translated text in target output
-            targetOutput.textContent = result.translated_text;
-            targetOutput.classList.remove('empty');
-            
-            //play translated audio if available
-            if (result.audio) {
-                playBase64Audio(result.audio);
-            }
-
-        } else {
+        if (!response.ok) {
+            const result = await response.json();
             throw new Error(result.error || 'Full translation failed on the server.');
         }
+
+        const translatedSentences = [];
+        const player = createSequentialPlayer();
+
+        await readEventStream(response, (event, data) => {
+            if (event === 'original_text') {
+                //display transcribed text in source input
+                sourceInput.value = data.text;
+                targetOutput.textContent = 'Translating...';
+            } else if (event === 'translated_text') {
+                //display each translated sentence as soon as it arrives
+                translatedSentences[data.index] = data.text;
+                targetOutput.textContent = translatedSentences.filter(Boolean).join(' ');
+                targetOutput.classList.remove('empty');
+            } else if (event === 'audio') {
+                //play translated audio sentence by sentence, in order
+                player.add(data.index, data.audio_url);
+            } else if (event === 'done') {
+                targetOutput.textContent = data.translated_text || targetOutput.textContent;
+            } else if (event === 'error') {
+                console.error('Pipeline stage failed:', data);
+                if (data.stage === 'transcribe') {
+                    throw new Error(data.error);
+                }
+                //don't let one failed sentence hold up the audio after it
+                if (data.index !== undefined) {
+                    player.skip(data.index);
+                }
+            }
+        });
     } catch (error) {
         console.error('Full pipeline error:', error);
         //show error message in UI
@@ -2,16 +2,53 @@
 let selectedSpeaks = [];
 let selectedLearning = [];
 
+//paging state: cursor for the next page of partner suggestions
+let nextAfter = null;
+let loadingMore = false;
+//pages currently shown, and a counter bumped on every reload so pages
+//requested before the reload are dropped when they arrive
+let pagesLoaded = 0;
+let listGeneration = 0;
+
 window.addEventListener('DOMContentLoaded', async function() {
     //set up event listeners for language selection buttons
     setupLanguageSelection();
     //load initial set of language exchange requests
     await loadExchangeRequests();
     
-    // Refresh requests every 10 seconds
-    setInterval(loadExchangeRequests, 10000);
+    // Refresh requests whenever someone publishes one (pushed by the server)
+    const events = new EventSource('/events?topics=exchange_requests');
+    events.addEventListener('exchange_requests', onExchangeRequestsChanged);
 });
 
+//someone published a request: reload the first page in place, but don't throw
+//away pages the user scrolled through; offer a prompt to reload instead
+function onExchangeRequestsChanged() {
+    if (pagesLoaded <= 1) {
+        loadExchangeRequests();
+    } else {
+        showNewMatchesNotice(true);
+    }
+}
+
+//show or hide the "new matches available" prompt above the list
+function showNewMatchesNotice(visible) {
+    let notice = document.getElementById('newMatchesNotice');
+    if (!notice) {
+        if (!visible) return;
+        notice = document.createElement('button');
+        notice.id = 'newMatchesNotice';
+        notice.className = 'new-matches-btn';
+        notice.addEventListener('click', async () => {
+            await loadExchangeRequests();
+            document.getElementById('exchangeContainer').scrollIntoView({ behavior: 'smooth' });
+        });
+        document.getElementById('exchangeContainer').before(notice);
+    }
+    notice.textContent = i18n.t('exchange.newMatches');
+    notice.style.display = visible ? '' : 'none';
+}
+
 //sets up event listeners for language selection buttons and publish button
 function setupLanguageSelection() {
     const speaksGrid = document.getElementById('speaksGrid');
@@ -102,20 +139,31 @@ async function publishRequest() {
     }
 }
 
-//fetch all language exchange requests from backend
+//fetch one page of exchange partners from backend, best matches first
+async function fetchExchangePage(after) {
+    const params = new URLSearchParams();
+    if (after) params.set('after', after);
+    const response = await fetch(`/get-exchange-requests?${params}`, {
+        method: 'GET',
+        credentials: 'include'  //include cookies for session
+    });
+    return response.json();
+}
+
+//load the first page of language exchange requests
 async function loadExchangeRequests() {
+    const generation = ++listGeneration;
     try {
-        //request list of exchange requests from backend
-        const response = await fetch('/get-exchange-requests', {
-            method: 'GET',
-            credentials: 'include'  //include cookies for session
-        });
-        
-        const data = await response.json();
+        const data = await fetchExchangePage(null);
+        //a newer reload started while this one was in flight
+        if (generation !== listGeneration) return;
         
         if (data.success) {
             //display the retrieved requests
-            displayExchangeRequests(data.requests);
+            displayExchangeRequests(data.requests, true);
+            updateLoadMore(data);
+            pagesLoaded = 1;
+            showNewMatchesNotice(false);
         } else {
             console.error('Failed to load requests:', data.message);
         }
@@ -124,14 +172,52 @@ async function loadExchangeRequests() {
     }
 }
 
+//append the next page of requests below the current ones
+async function loadMoreRequests() {
+    if (loadingMore || !nextAfter) return;
+    loadingMore = true;
+    const generation = listGeneration;
+    try {
+        const data = await fetchExchangePage(nextAfter);
+        //the list was reloaded meanwhile, so this page follows a stale cursor
+        if (generation !== listGeneration) return;
+        if (data.success) {
+            displayExchangeRequests(data.requests, false);
+            updateLoadMore(data);
+            pagesLoaded += 1;
+        } else {
+            console.error('Failed to load requests:', data.message);
+        }
+    } catch (error) {
+        console.error('Error loading requests:', error);
+    } finally {
+        loadingMore = false;
+    }
+}
+
+//show a "Load more" button under the list while more pages exist
+function updateLoadMore(data) {
+    nextAfter = data.has_more ? data.next_after : null;
+    let button = document.getElementById('loadMoreRequests');
+    if (!button) {
+        button = document.createElement('button');
+        button.id = 'loadMoreRequests';
+        button.className = 'accept-btn load-more-btn';
+        button.addEventListener('click', loadMoreRequests);
+        document.getElementById('exchangeContainer').after(button);
+    }
+    button.textContent = i18n.t('exchange.loadMore');
+    button.style.display = nextAfter ? '' : 'none';
+}
+
 //display language exchange requests as cards in the UI
-function displayExchangeRequests(requests) {
+function displayExchangeRequests(requests, reset) {
     const container = document.getElementById('exchangeContainer');
-    //clear existing content
-    container.innerHTML = '';
+    //clear existing content when showing the first page
+    if (reset) container.innerHTML = '';
     
     //show message if no requests are available
-    if (requests.length === 0) {
+    if (reset && requests.length === 0) {
         container.innerHTML = `<p style="text-align: center; color: #666; padding: 20px;">${i18n.t('exchange.noRequests')}</p>`;
         return;
     }
@@ -147,6 +233,15 @@ function displayExchangeRequests(requests) {
         name.className = 'name';
         name.textContent = request.fullname || request.username;
         
+        //flag partners who can teach you and learn from you
+        if (request.reciprocal) {
+            card.classList.add('mutual');
+            const badge = document.createElement('span');
+            badge.className = 'mutual-badge';
+            badge.textContent = i18n.t('exchange.mutualMatch');
+            name.appendChild(badge);
+        }
+        
         //create section for languages they speak
         const speaksDiv = document.createElement('div');
         speaksDiv.className = 'tags';
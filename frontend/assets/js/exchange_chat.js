@@ -9,10 +9,46 @@ const partnerId = urlParams.get('partner_id');
 // Store translations to avoid re-translating
 const translations = {};
 
+// Paging state: cursor for the next older page and the newest message shown
+let olderCursor = null;
+let hasOlder = false;
+let loadingOlder = false;
+let lastMessageId = 0;
+let initialized = false;
+// Conversation version from the last poll, sent back so an idle poll gets a 304
+let conversationEtag = null;
+
 //load messages when page loads
 window.addEventListener('DOMContentLoaded', loadMessages);
-//poll for new messages every 3 seconds to keep chat updated
-setInterval(loadMessages, 3000);
+//new messages are pushed by the server; each one for this conversation triggers a delta fetch
+const events = new EventSource('/events');
+events.addEventListener('message', (event) => {
+    const msg = JSON.parse(event.data);
+    if (String(msg.sender_id) === partnerId || String(msg.receiver_id) === partnerId) {
+        loadMessages();
+    }
+});
+//after a reconnect, catch up on anything sent while the stream was down
+events.addEventListener('open', () => {
+    if (initialized) loadMessages();
+});
+//load the previous page when the user scrolls to the top
+messageArea.addEventListener('scroll', () => {
+    if (messageArea.scrollTop === 0) {
+        loadOlderMessages();
+    }
+});
+
+//request one page of the conversation (newest page unless a cursor is given)
+async function fetchMessages(params = {}, headers = {}) {
+    const query = new URLSearchParams(params).toString();
+    return fetch(`/get-exchange-messages/${partnerId}${query ? '?' + query : ''}`, {
+        method: 'GET',
+        credentials: 'include',  //include session cookies for authentication
+        headers: headers,
+        cache: 'no-store'  // conditional requests are handled here, not by the browser cache
+    });
+}
 
 async function loadMessages() {
     //validate that we have a partner id
@@ -22,25 +58,43 @@ async function loadMessages() {
     }
     
     try {
-        //request messages frmo back end
-        const response = await fetch(`/get-exchange-messages/${partnerId}`, {
-            method: 'GET',
-            credentials: 'include'  //include session cookies for authentication
-        });
+        //request the newest messages from back end
+        // After the first page, ask only for messages newer than the last one shown
+        const params = initialized ? { since_id: lastMessageId } : {};
+        const headers = initialized && conversationEtag ? { 'If-None-Match': conversationEtag } : {};
+        const response = await fetchMessages(params, headers);
+        
+        // Nothing changed since the last poll
+        if (response.status === 304) return;
         
         const data = await response.json();
         
         if (data.success) {
-            //clear existing messages
-            messageArea.innerHTML = '';
-            
-            //display each message in chronological order
-            data.messages.forEach(msg => {
+            //the first page also tells us where scrolling back starts
+            if (!initialized) {
+                olderCursor = data.next_before;
+                hasOlder = data.has_more;
+                initialized = true;
+            }
+
+            //only append messages newer than what is already shown
+            const newMessages = data.messages.filter(msg => msg.id > lastMessageId);
+            newMessages.forEach(msg => {
                 displayMessage(msg);
             });
             
-            //scroll to bottom to show latest messages
-            messageArea.scrollTop = messageArea.scrollHeight;
+            if (newMessages.length > 0) {
+                lastMessageId = newMessages[newMessages.length - 1].id;
+                //scroll to bottom to show latest messages
+                messageArea.scrollTop = messageArea.scrollHeight;
+            }
+            // The version covers every message, so only keep it once we have caught up
+            conversationEtag = data.has_newer ? null : response.headers.get('ETag');
+
+            // More new messages than fit in one response: keep going
+            if (data.has_newer) {
+                await loadMessages();
+            }
         } else {
             console.error('Failed to load messages:', data.message);
         }
@@ -49,7 +103,39 @@ async function loadMessages() {
     }
 }
 
-function displayMessage(msg) {
+//fetch the page before the oldest shown message and put it above the current ones
+async function loadOlderMessages() {
+    if (!hasOlder || loadingOlder) return;
+    loadingOlder = true;
+
+    try {
+        const response = await fetchMessages({ before: olderCursor });
+        const data = await response.json();
+
+        if (data.success) {
+            const older = document.createDocumentFragment();
+            data.messages.forEach(msg => {
+                displayMessage(msg, older);
+            });
+
+            //keep the messages the user was looking at in place
+            const previousHeight = messageArea.scrollHeight;
+            messageArea.insertBefore(older, messageArea.firstChild);
+            messageArea.scrollTop = messageArea.scrollHeight - previousHeight;
+
+            olderCursor = data.next_before;
+            hasOlder = data.has_more;
+        } else {
+            console.error('Failed to load older messages:', data.message);
+        }
+    } catch (error) {
+        console.error('Error loading older messages:', error);
+    } finally {
+        loadingOlder = false;
+    }
+}
+
+function displayMessage(msg, container = messageArea) {
     //create wrapper for message
     const wrapper = document.createElement("div");
     wrapper.className = "message-wrapper";
@@ -90,7 +176,7 @@ function displayMessage(msg) {
         wrapper.appendChild(translationDiv);
     }
     
-    messageArea.appendChild(wrapper);
+    container.appendChild(wrapper);
 }
 
 async function translateMessage(messageId, text, wrapper, button) {
@@ -58,6 +58,13 @@ async function loadFriends() {
                     const a = document.createElement('a');
                     a.href = `messages.html?friend_id=${friend.id}`;  //link to messages page with this friends ID
                     a.textContent = friend.fullname || friend.username;  //display full name if available, otherwise username
+                    //show how many unread messages this friend has sent
+                    if (friend.unread_count > 0) {
+                        const badge = document.createElement('span');
+                        badge.className = 'unread-badge';
+                        badge.textContent = friend.unread_count;
+                        a.appendChild(badge);
+                    }
                     li.appendChild(a);
                     friendsList.appendChild(li);
                 });
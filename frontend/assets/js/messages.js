@@ -7,13 +7,50 @@ const messageArea = document.getElementById("messageArea");  //container for dis
 const urlParams = new URLSearchParams(window.location.search);
 const friendId = urlParams.get('friend_id');
 
+// Paging state: cursor for the next older page and the newest message shown
+let olderCursor = null;
+let hasOlder = false;
+let loadingOlder = false;
+let lastMessageId = 0;
+let initialized = false;
+// Conversation version from the last poll, sent back so an idle poll gets a 304
+let conversationEtag = null;
+
 // Load existing messages when page loads
 window.addEventListener('DOMContentLoaded', loadMessages);
 
-// Auto-refresh messages every 3 seconds
-setInterval(loadMessages, 3000);
+// New messages are pushed by the server; each one for this conversation triggers a delta fetch
+const events = new EventSource('/events');
+events.addEventListener('message', (event) => {
+    const msg = JSON.parse(event.data);
+    if (String(msg.sender_id) === friendId || String(msg.receiver_id) === friendId) {
+        loadMessages();
+    }
+});
+// After a reconnect, catch up on anything sent while the stream was down
+events.addEventListener('open', () => {
+    if (initialized) loadMessages();
+});
+
+// Load the previous page when the user scrolls to the top
+messageArea.addEventListener('scroll', () => {
+    if (messageArea.scrollTop === 0) {
+        loadOlderMessages();
+    }
+});
 
-// Fetch and display messages from the server
+// Request one page of the conversation (newest page unless a cursor is given)
+async function fetchMessages(params = {}, headers = {}) {
+    const query = new URLSearchParams(params).toString();
+    return fetch(`/get-messages/${friendId}${query ? '?' + query : ''}`, {
+        method: 'GET',
+        credentials: 'include',
+        headers: headers,
+        cache: 'no-store'  // conditional requests are handled here, not by the browser cache
+    });
+}
+
+// Fetch the newest messages and display any not shown yet
 async function loadMessages() {
     //validate friendId
     if (!friendId) {
@@ -23,24 +60,42 @@ async function loadMessages() {
     
     try {
         //send request to backend to get messages
-        const response = await fetch(`/get-messages/${friendId}`, {
-            method: 'GET',
-            credentials: 'include'
-        });
+        // After the first page, ask only for messages newer than the last one shown
+        const params = initialized ? { since_id: lastMessageId } : {};
+        const headers = initialized && conversationEtag ? { 'If-None-Match': conversationEtag } : {};
+        const response = await fetchMessages(params, headers);
+        
+        // Nothing changed since the last poll
+        if (response.status === 304) return;
         
         const data = await response.json();
         
         if (data.success) {
-            // Clear current messages
-            messageArea.innerHTML = '';
-            
-            // Display all messages
-            data.messages.forEach(msg => {
+            // The first page also tells us where scrolling back starts
+            if (!initialized) {
+                olderCursor = data.next_before;
+                hasOlder = data.has_more;
+                initialized = true;
+            }
+
+            // Only append messages newer than what is already shown
+            const newMessages = data.messages.filter(msg => msg.id > lastMessageId);
+            newMessages.forEach(msg => {
                 displayMessage(msg.message_text, msg.is_mine, msg.sender_username);
             });
             
-            // Scroll to bottom
-            messageArea.scrollTop = messageArea.scrollHeight;
+            if (newMessages.length > 0) {
+                lastMessageId = newMessages[newMessages.length - 1].id;
+                // Scroll to bottom
+                messageArea.scrollTop = messageArea.scrollHeight;
+            }
+            // The version covers every message, so only keep it once we have caught up
+            conversationEtag = data.has_newer ? null : response.headers.get('ETag');
+
+            // More new messages than fit in one response: keep going
+            if (data.has_newer) {
+                await loadMessages();
+            }
         } else {
             console.error('Failed to load messages:', data.message);
         }
@@ -49,8 +104,40 @@ async function loadMessages() {
     }
 }
 
-//creates and displays a single message in the chat area
-function displayMessage(text, isMine, senderUsername) {
+// Fetch the page before the oldest shown message and put it above the current ones
+async function loadOlderMessages() {
+    if (!hasOlder || loadingOlder) return;
+    loadingOlder = true;
+
+    try {
+        const response = await fetchMessages({ before: olderCursor });
+        const data = await response.json();
+        
+        if (data.success) {
+            const older = document.createDocumentFragment();
+            data.messages.forEach(msg => {
+                displayMessage(msg.message_text, msg.is_mine, msg.sender_username, older);
+            });
+
+            // Keep the messages the user was looking at in place
+            const previousHeight = messageArea.scrollHeight;
+            messageArea.insertBefore(older, messageArea.firstChild);
+            messageArea.scrollTop = messageArea.scrollHeight - previousHeight;
+
+            olderCursor = data.next_before;
+            hasOlder = data.has_more;
+        } else {
+            console.error('Failed to load older messages:', data.message);
+        }
+    } catch (error) {
+        console.error('Error loading older messages:', error);
+    } finally {
+        loadingOlder = false;
+    }
+}
+
+//creates and displays a single message in the chat area (or another container)
+function displayMessage(text, isMine, senderUsername, container = messageArea) {
     //create message container
     const msg = document.createElement("div");
     msg.className = isMine ? "message you" : "message friend";
@@ -68,7 +155,7 @@ function displayMessage(text, isMine, senderUsername) {
     msg.appendChild(label);
     msg.appendChild(content);
     //add message to message area
-    messageArea.appendChild(msg);
+    container.appendChild(msg);
 }
 
 //send a new message to the friend
@@ -7,6 +7,14 @@ let recognition = null;
 let mediaRecorder = null;
 let audioChunks = [];
 
+// Variables for streaming transcription
+const STREAM_CHUNK_MS = 1000;  //send audio to the backend every second
+let streamId = null;
+let streamEvents = null;
+let streamUploads = Promise.resolve();  //keeps chunk uploads in order
+let finalTranscript = [];
+let finalTranslation = [];
+
 if ('webkitSpeechRecognition' in window || 'SpeechRecognition' in window) {
     const SpeechRecognition = window.SpeechRecognition || window.webkitSpeechRecognition;
     recognition = new SpeechRecognition();
@@ -47,21 +55,37 @@ async function toggleSpeechInput() {
             mediaRecorder = new MediaRecorder(stream);
             audioChunks = [];
 
+            //stream audio to the backend while recording, if available
+            const streaming = await startStream();
+
             //collect audio data
             mediaRecorder.ondataavailable = (event) => {
-                audioChunks.push(event.data);
+                if (streaming) {
+                    sendStreamChunk(event.data);
+                } else {
+                    audioChunks.push(event.data);
+                }
             };
 
-            //when recording stops, process the audio
+            //when recording stops, finish the stream or process the whole clip
             mediaRecorder.onstop = async () => {
-                const audioBlob = new Blob(audioChunks, { type: 'audio/wav' });  //create audio blob
-                await processAudioWithBackend(audioBlob);  //process with backend
-                
                 stream.getTracks().forEach(track => track.stop());  //stop all tracks
+
+                if (streaming) {
+                    document.getElementById('micText').textContent = 'Finishing...';
+                    await endStream();
+                } else {
+                    const audioBlob = new Blob(audioChunks, { type: 'audio/wav' });  //create audio blob
+                    await processAudioWithBackend(audioBlob);  //process with backend
+                }
             };
 
-            //start recording
-            mediaRecorder.start();
+            //start recording, emitting a chunk every second when streaming
+            if (streaming) {
+                mediaRecorder.start(STREAM_CHUNK_MS);
+            } else {
+                mediaRecorder.start();
+            }
             isRecording = true;
             document.getElementById('micButton').classList.add('active');
             document.getElementById('micText').textContent = 'Recording... (Click to stop)';
@@ -72,6 +96,113 @@ async function toggleSpeechInput() {
     }
 }
 
+//open a live transcription stream and subscribe to its results
+async function startStream() {
+    try {
+        const response = await fetch(`${API_URL}/stream`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                target_language: document.getElementById('targetLanguage').value
+            })
+        });
+
+        if (!response.ok) {
+            throw new Error('Could not start stream');
+        }
+
+        const data = await response.json();
+        streamId = data.stream_id;
+        streamUploads = Promise.resolve();
+        finalTranscript = [];
+        finalTranslation = [];
+
+        //listen for transcripts pushed by the backend
+        streamEvents = new EventSource(`${API_URL}/stream/${streamId}/events`);
+        streamEvents.addEventListener('partial', (event) => {
+            showStreamText(JSON.parse(event.data), false);
+        });
+        streamEvents.addEventListener('final', (event) => {
+            showStreamText(JSON.parse(event.data), true);
+        });
+        streamEvents.addEventListener('done', () => {
+            closeStream();
+            document.getElementById('micText').textContent = 'Speech Input';
+            //read the finished translation aloud
+            if (document.getElementById('outputText').value) {
+                speakText('output');
+            }
+        });
+        streamEvents.addEventListener('error', (event) => {
+            closeStream();
+            document.getElementById('micText').textContent = 'Speech Input';
+            if (event.data) {
+                alert('Error processing audio: ' + JSON.parse(event.data).error);
+            }
+        });
+        return true;
+    } catch (error) {
+        //fall back to uploading the whole recording
+        console.error('Streaming unavailable:', error);
+        return false;
+    }
+}
+
+//upload one recorded chunk, after any earlier chunks
+function sendStreamChunk(chunk) {
+    if (!streamId || chunk.size === 0) {
+        return;
+    }
+    const id = streamId;
+    streamUploads = streamUploads.then(() => fetch(`${API_URL}/stream/${id}/audio`, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/octet-stream'
+        },
+        body: chunk
+    })).catch(error => {
+        console.error('Error sending audio chunk:', error);
+    });
+}
+
+//tell the backend the recording is over once all chunks are sent
+async function endStream() {
+    const id = streamId;
+    await streamUploads;
+    try {
+        await fetch(`${API_URL}/stream/${id}/end`, { method: 'POST' });
+    } catch (error) {
+        console.error('Error ending stream:', error);
+        closeStream();
+        document.getElementById('micText').textContent = 'Speech Input';
+    }
+}
+
+function closeStream() {
+    if (streamEvents) {
+        streamEvents.close();
+        streamEvents = null;
+    }
+    streamId = null;
+}
+
+//show committed text followed by the in-progress partial
+function showStreamText(data, isFinal) {
+    if (isFinal) {
+        finalTranscript.push(data.text);
+        finalTranslation.push(data.translated_text || '');
+    }
+    const pendingText = isFinal ? '' : data.text;
+    const pendingTranslation = isFinal ? '' : (data.translated_text || '');
+
+    document.getElementById('inputText').value = [...finalTranscript, pendingText].join(' ').trim();
+    document.getElementById('outputText').value = [...finalTranslation, pendingTranslation].join(' ').trim();
+    updateCharCount('input');
+    updateCharCount('output');
+}
+
 //send recorded audio to backend for processing
 async function processAudioWithBackend(audioBlob) {
     try {
@@ -104,8 +235,8 @@ async function processAudioWithBackend(audioBlob) {
         updateCharCount('output');
 
         //play translated audio if provided
-        if (data.audio) {
-            playBase64Audio(data.audio);
+        if (data.audio_url) {
+            playAudioUrl(data.audio_url);
         }
 
         //reset mic button text
@@ -195,7 +326,8 @@ async function speakText(type) {
             },
             body: JSON.stringify({
                 text: text,
-                language: lang
+                language: lang,
+                stream: true  //start playing before long texts finish synthesizing
             })
         });
 
@@ -204,7 +336,7 @@ async function speakText(type) {
         }
 
         const data = await response.json();
-        playBase64Audio(data.audio);  //play the generated audio
+        playAudioUrl(data.audio_url);  //play the generated audio
 
         setTimeout(function() {
             document.getElementById("logo-image").src = "assets/img/logo_cropped.png";
@@ -217,9 +349,9 @@ async function speakText(type) {
     }
 }
 
-function playBase64Audio(base64Audio) {
-    //create audio element and play
-    const audio = new Audio('data:audio/mp3;base64,' + base64Audio);
+function playAudioUrl(audioUrl) {
+    //create audio element for the cached file and play
+    const audio = new Audio(audioUrl);
     audio.play().catch(error => {
         console.error('Error playing audio:', error);
     });
@@ -7,6 +7,17 @@ const feed = document.getElementById('feed');
 // Store translations to avoid re-translating
 const translations = {};
 
+//feed paging state: cursor for the next (older) page
+let nextBefore = null;
+let loadingMore = false;
+
+//"Load more" button shown under the feed while older posts exist
+const loadMoreBtn = document.createElement('button');
+loadMoreBtn.className = 'action-button load-more-button';
+loadMoreBtn.style.display = 'none';
+feed.after(loadMoreBtn);
+loadMoreBtn.addEventListener('click', () => loadMorePosts());
+
 // Create post box
 createPostBtn.addEventListener('click', async () => {
     const title = postTitle.value.trim();
@@ -48,25 +59,52 @@ createPostBtn.addEventListener('click', async () => {
     }
 });
 
-// Load all posts
+// Load the first page of posts
 async function loadFeed() {
     feed.innerHTML = '';
+    nextBefore = null;
     try {
-        //fetch posts from backend
-        const res = await fetch('/posts', { credentials: 'include' });
-        const posts = await res.json();
-        //render each post
-        for (let post of posts) {
-            await renderPost(post);
-        }
+        await loadFeedPage();
     } catch (err) {
         console.error(err);
         feed.innerHTML = '<p>Failed to load posts.</p>';
     }
 }
 
+// Append the next page of older posts
+async function loadMorePosts() {
+    if (loadingMore || !nextBefore) return;
+    loadingMore = true;
+    try {
+        await loadFeedPage(nextBefore);
+    } catch (err) {
+        console.error(err);
+        alert('Network error while loading posts');
+    } finally {
+        loadingMore = false;
+    }
+}
+
+async function loadFeedPage(before) {
+    //fetch one page of posts, like counts included
+    const params = new URLSearchParams();
+    if (before) params.set('before', before);
+    const res = await fetch(`/posts?${params}`, { credentials: 'include' });
+    const data = await res.json();
+    if (!data.success) throw new Error(data.message || 'Failed to load posts');
+
+    //render each post
+    for (let post of data.posts) {
+        renderPost(post);
+    }
+
+    nextBefore = data.has_more ? data.next_before : null;
+    loadMoreBtn.textContent = i18n.t('post.loadMore');
+    loadMoreBtn.style.display = nextBefore ? '' : 'none';
+}
+
 // Creating a post
-async function renderPost(post) {
+function renderPost(post) {
     //create post container
     const div = document.createElement('div');
     div.className = 'post';
@@ -85,7 +123,7 @@ async function renderPost(post) {
         <div class="post-actions">
             <button class="action-button like-button" data-post-id="${post.id}">
                 <span>👍</span>
-                <span class="like-count">0  ${i18n.t('post.likes')}</span>
+                <span class="like-count">${post.like_count} ${i18n.t('post.likes')}</span>
             </button>
             <button class="action-button repost-button" data-post-id="${post.id}">
                 <span>🔁</span>
@@ -107,19 +145,8 @@ async function renderPost(post) {
     const repostBtn = div.querySelector('.repost-button');
     const translateBtn = div.querySelector('.translate-button');
 
-    // Like Count
-    try {
-        const res = await fetch(`/post-likes/${post.id}`, { credentials: 'include' });
-        const data = await res.json();
-        if (data.success) {
-            //update like count and button state
-            likeCountSpan.textContent = `${data.count} ${i18n.t('post.likes')}`;
-            //highlight like button if user has liked
-            if (data.liked) likeBtn.classList.add('active');
-        }
-    } catch (err) { 
-        console.error('Failed to load likes', err);
-    }
+    //highlight like button if user has liked
+    if (post.liked) likeBtn.classList.add('active');
 
     // Likes
     likeBtn.addEventListener('click', async () => {
@@ -134,15 +161,10 @@ async function renderPost(post) {
             });
             const result = await res.json();
             if (result.success) {
-                //fetch updated like count
-                const likeRes = await fetch(`/post-likes/${postId}`, { credentials: 'include' });
-                const likeData = await likeRes.json();
-                if (likeData.success) {
-                    //update like count and button state
-                    likeCountSpan.textContent = `${likeData.count} ${i18n.t('post.likes')}`; 
-                    if (likeData.liked) likeBtn.classList.add('active');
-                    else likeBtn.classList.remove('active');
-                }
+                //update like count and button state from the response
+                likeCountSpan.textContent = `${result.count} ${i18n.t('post.likes')}`;
+                if (result.liked) likeBtn.classList.add('active');
+                else likeBtn.classList.remove('active');
             } else {
                 alert(result.message || 'Failed to like/unlike');
             }
@@ -203,34 +225,21 @@ async function translatePost(postId, title, content, postDiv, button) {
     button.querySelector('span:last-child').textContent = i18n.t('post.translating') || 'Translating...';
     
     try {
-        // Translate both title and content
-        const titleResponse = await fetch('/api/translate', {
-            method: 'POST',
-            headers: { 
-                'Content-Type': 'application/json'
-            },
-            credentials: 'include',
-            body: JSON.stringify({
-                text: title,
-                target_language: targetLang
-            })
-        });
-        
-        //translate content
-        const contentResponse = await fetch('/api/translate', {
+        // Translate both title and content in one batch request
+        const response = await fetch('/api/translate/batch', {
             method: 'POST',
             headers: { 
                 'Content-Type': 'application/json'
             },
             credentials: 'include',
             body: JSON.stringify({
-                text: content,
+                texts: [title, content],
                 target_language: targetLang
             })
         });
         
-        const titleData = await titleResponse.json();
-        const contentData = await contentResponse.json();
+        const data = await response.json();
+        const [titleData, contentData] = data.results || [{ error: data.error }, {}];
         
         //check if both translations were successful
         if (titleData.translated_text && contentData.translated_text) {